@@ -0,0 +1,8 @@
+"""Benchmarks for SecureClipGaurd. Run from the repository root, e.g.
+
+    python -m benchmarks.bench_token_format
+
+The full suite writes JSON and compares it against an earlier run:
+
+    python -m benchmarks.suite -o after.json --baseline before.json
+"""
@@ -0,0 +1,31 @@
+"""Token size and encrypt/decrypt time per compression codec and corpus"""
+import logging
+
+from benchmarks.common import measure, use_temporary_keyring
+from benchmarks.corpora import CORPORA
+
+SIZES = [200, 10_000, 1_000_000]
+
+
+def main():
+    use_temporary_keyring()
+    from compression import CODECS
+    from encryption import Encryption
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'corpus':>10} {'size':>9} {'codec':>6} {'token':>9} {'ratio':>6} {'encrypt':>11} {'decrypt':>11}")
+    for corpus, make in CORPORA.items():
+        for size in SIZES:
+            text = make(size)
+            for codec in CODECS:
+                encryption = Encryption(compression=codec)
+                token = encryption.encrypt(text)
+                assert encryption.decrypt(token) == text
+                enc_time = measure(encryption.encrypt, text)
+                dec_time = measure(encryption.decrypt, token)
+                print(f"{corpus:>10} {size:>9} {codec:>6} {len(token):>9} {len(token) / size:>6.2f} "
+                      f"{enc_time * 1e3:>9.3f}ms {dec_time * 1e3:>9.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Compare per-operation latency and token size of the cipher engines"""
+import logging
+
+from benchmarks.common import PAYLOAD_SIZES, make_text, measure, throughput, use_temporary_keyring
+
+
+def main():
+    use_temporary_keyring()
+    from encryption import Encryption, HEADER, FORMAT_VERSION
+    logging.getLogger().setLevel(logging.WARNING)
+
+    encryption = Encryption()
+    print(f"{'size':>9} {'engine':>18} {'blob':>9} {'encrypt':>10} {'decrypt':>10} "
+          f"{'enc tput':>13} {'dec tput':>13}")
+    for size in PAYLOAD_SIZES:
+        data = make_text(size).encode()
+        for engine in encryption.engines.values():
+            header = HEADER.pack(FORMAT_VERSION, engine.engine_id, 0)
+            blob = header + engine.encrypt(data, header)
+            assert encryption.decrypt_blob(blob) == data
+            enc_time = measure(engine.encrypt, data, header)
+            dec_time = measure(encryption.decrypt_blob, blob)
+            print(f"{size:>9} {engine.name:>18} {len(blob):>9} {enc_time * 1e6:>8.1f}us "
+                  f"{dec_time * 1e6:>8.1f}us {throughput(size, enc_time)} {throughput(size, dec_time)}")
+
+
+if __name__ == "__main__":
+    main()
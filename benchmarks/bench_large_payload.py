@@ -0,0 +1,129 @@
+"""Peak RSS while encrypting and decrypting one very large clipboard copy.
+
+Every stage runs in a fresh interpreter because ru_maxrss only ever grows.
+The reported figure is the peak minus the RSS once the payload exists, so
+it counts only the memory the clipboard pipeline itself adds.
+
+    python -m benchmarks.bench_large_payload --size-mb 100
+"""
+import argparse
+import base64
+import logging
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import use_temporary_keyring
+
+STAGES = ("encrypt", "decrypt", "monitor")
+
+
+def current_rss():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def make_payload(size, kind):
+    """Log-like (compressible) or random base64 (barely compressible) text"""
+    if kind == "random":
+        return base64.b64encode(os.urandom(size * 3 // 4 + 3)).decode()[:size]
+    from benchmarks.common import make_text
+    return make_text(size)
+
+
+def run_monitor(payload):
+    """Copy the payload, let the monitor encrypt it, then paste the token back"""
+    from clipboard_backend import MemoryBackend
+    from clipboard_monitor import ClipboardMonitor
+
+    class CountingBackend(MemoryBackend):
+        pastes = 0
+
+        def paste(self):
+            CountingBackend.pastes += 1
+            return super().paste()
+
+    def wait_until(predicate):
+        while not predicate():
+            time.sleep(0.01)
+
+    backend = CountingBackend()
+    monitor = ClipboardMonitor(backend=backend)
+    thread = threading.Thread(target=monitor.start_monitoring, daemon=True)
+    thread.start()
+    wait_until(lambda: CountingBackend.pastes >= 2)
+
+    backend.copy(payload)
+    wait_until(lambda: backend.generation >= 2)
+    token = backend.paste()
+    backend.copy(token)
+    del token
+    # The next paste only happens once the token has been handled
+    pastes = CountingBackend.pastes
+    backend.copy("done")
+    wait_until(lambda: CountingBackend.pastes > pastes and backend.generation >= 5)
+    monitor.stop_monitoring()
+    thread.join(5)
+    return True
+
+
+def run_stage(stage, size, kind, token_file, keyring_dir):
+    logging.disable(logging.WARNING)
+    use_temporary_keyring(keyring_dir)
+    from encryption import Encryption
+
+    encryption = Encryption()
+    if stage == "prepare":
+        with open(token_file, "w") as f:
+            f.write(encryption.encrypt(make_payload(size, kind)))
+        return
+    if stage == "decrypt":
+        with open(token_file) as f:
+            token = f.read()
+    else:
+        payload = make_payload(size, kind)
+    baseline = current_rss()
+    start = time.perf_counter()
+    if stage == "encrypt":
+        result = encryption.encrypt(payload)
+    elif stage == "decrypt":
+        result = encryption.classify(token).plaintext
+    else:
+        result = run_monitor(payload)
+    elapsed = time.perf_counter() - start
+    assert result
+    print(f"{stage:>8} {kind:>7} {size / 1e6:>7.0f} MB  "
+          f"peak +{(peak_rss() - baseline) / 1e6:>7.1f} MB  {elapsed:>6.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=100)
+    parser.add_argument("--kind", choices=("text", "random"), default="random")
+    parser.add_argument("--stage", choices=("prepare",) + STAGES)
+    parser.add_argument("--token-file")
+    parser.add_argument("--keyring-dir")
+    args = parser.parse_args(argv)
+    size = int(args.size_mb * 1e6)
+
+    if args.stage:
+        run_stage(args.stage, size, args.kind, args.token_file, args.keyring_dir)
+        return
+    # Children share one throwaway keyring so the decrypt stage has the key
+    keyring_dir = use_temporary_keyring()
+    token_file = os.path.join(keyring_dir, "token.txt")
+    for stage in ("prepare",) + STAGES:
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_large_payload",
+                        "--stage", stage, "--size-mb", str(args.size_mb), "--kind", args.kind,
+                        "--token-file", token_file, "--keyring-dir", keyring_dir], check=True)
+
+
+if __name__ == "__main__":
+    main()
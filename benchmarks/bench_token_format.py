@@ -0,0 +1,27 @@
+"""Compare token size and throughput of the legacy and compact token formats"""
+import logging
+
+from benchmarks.common import PAYLOAD_SIZES, make_text, measure, throughput, use_temporary_keyring
+
+
+def main():
+    use_temporary_keyring()
+    from encryption import Encryption, ENCODINGS
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Uncompressed, so only the format differs (codecs: bench_compression.py)
+    encryption = Encryption(compression="none")
+    print(f"{'size':>9} {'format':>7} {'token':>10} {'overhead':>9} {'encrypt':>13} {'decrypt':>13}")
+    for size in PAYLOAD_SIZES:
+        text = make_text(size)
+        for encoding in ENCODINGS:
+            token = encryption.encrypt(text, encoding)
+            assert encryption.decrypt(token) == text
+            enc_time = measure(encryption.encrypt, text, encoding)
+            dec_time = measure(encryption.decrypt, token)
+            print(f"{size:>9} {encoding:>7} {len(token):>10} {len(token) / size:>8.2f}x "
+                  f"{throughput(size, enc_time)} {throughput(size, dec_time)}")
+
+
+if __name__ == "__main__":
+    main()
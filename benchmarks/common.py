@@ -0,0 +1,62 @@
+import base64
+import os
+import random
+import statistics
+import tempfile
+import time
+
+PAYLOAD_SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def use_temporary_keyring(directory=None):
+    """Install a KeyManager whose keyring file lives in a throwaway directory.
+
+    The file path is set on the keyring itself rather than through
+    environment variables, which keyrings.alt ignores on some platforms
+    (LOCALAPPDATA on Windows), so benchmarks never rotate the user's real
+    key. Must run before anything builds a KeyManager. Pass the returned
+    directory to child processes to share the same key.
+    """
+    from keyrings.alt.file import PlaintextKeyring
+    from key_manager import KeyManager, set_key_manager
+    directory = directory or tempfile.mkdtemp(prefix="secureclip-bench-")
+    keyring = PlaintextKeyring()
+    keyring.file_path = os.path.join(directory, keyring.filename)
+    key_manager = KeyManager(keyring=keyring)
+    set_key_manager(key_manager)
+    if not key_manager.get_encryption_key():
+        key_manager.generate_new_key()
+    return directory
+
+
+def make_text(size):
+    """Printable text payload of roughly the given size"""
+    line = "2025-02-16 10:33:14 INFO user=alice action=copy id=0123456789abcdef\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def make_random_text(size, seed=0):
+    """Seeded random base64 text of the given size; zlib barely shrinks it"""
+    rng = random.Random(seed)
+    return base64.b64encode(rng.randbytes(size * 3 // 4 + 3)).decode()[:size]
+
+
+def measure_samples(func, *args, min_time=0.2, max_runs=1000, min_runs=3):
+    """Run func repeatedly and return every duration in seconds"""
+    durations = []
+    deadline = time.perf_counter() + min_time
+    while len(durations) < min_runs or (time.perf_counter() < deadline and len(durations) < max_runs):
+        start = time.perf_counter()
+        func(*args)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def measure(func, *args, min_time=0.2, max_runs=1000):
+    """Run func repeatedly and return the median duration in seconds"""
+    return statistics.median(measure_samples(func, *args, min_time=min_time, max_runs=max_runs))
+
+
+def throughput(size, seconds):
+    """Format MB/s for a payload size and duration"""
+    return f"{size / seconds / 1e6:8.1f} MB/s" if seconds else "     n/a"
@@ -0,0 +1,71 @@
+"""Synthetic but representative clipboard payloads for the benchmarks"""
+import json
+import os
+import random
+
+
+def json_document(size):
+    rng = random.Random(1)
+    records = []
+    while len(json.dumps(records)) < size:
+        records.append({
+            "id": rng.randrange(10 ** 6),
+            "user": f"user{rng.randrange(500)}@example.com",
+            "active": rng.random() < 0.5,
+            "roles": rng.sample(["admin", "dev", "ops", "viewer", "billing"], 2),
+            "updated_at": f"2025-02-{rng.randrange(1, 28):02d}T{rng.randrange(24):02d}:00:00Z",
+        })
+    return json.dumps(records, indent=2)[:size]
+
+
+def log_file(size):
+    rng = random.Random(2)
+    levels = ["INFO", "INFO", "INFO", "DEBUG", "WARNING", "ERROR"]
+    lines = []
+    total = 0
+    while total < size:
+        line = (f"2025-02-16 10:{rng.randrange(60):02d}:{rng.randrange(60):02d},{rng.randrange(1000):03d}"
+                f" - {rng.choice(levels)} - worker-{rng.randrange(8)} handled request"
+                f" {rng.randrange(16 ** 8):08x} in {rng.randrange(1, 900)} ms\n")
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)[:size]
+
+
+def stack_trace(size):
+    frame = ('  File "/srv/app/handlers/{0}.py", line {1}, in handle_{0}\n'
+             '    result = self.dispatch(request, context)\n')
+    rng = random.Random(3)
+    names = ["orders", "users", "billing", "auth", "search"]
+    parts = ["Traceback (most recent call last):\n"]
+    total = len(parts[0])
+    while total < size:
+        part = frame.format(rng.choice(names), rng.randrange(20, 400))
+        parts.append(part)
+        total += len(part)
+    return "".join(parts)[:size]
+
+
+def sql_dump(size):
+    rng = random.Random(4)
+    rows = ["INSERT INTO orders (id, customer_id, total, status) VALUES\n"]
+    total = len(rows[0])
+    while total < size:
+        row = f"  ({rng.randrange(10 ** 7)}, {rng.randrange(10 ** 5)}, {rng.randrange(10 ** 5) / 100}, 'shipped'),\n"
+        rows.append(row)
+        total += len(row)
+    return "".join(rows)[:size]
+
+
+def hex_text(size):
+    """High-entropy printable text such as hashes or keys (~4 bits per char)"""
+    return os.urandom(size // 2 + 1).hex()[:size]
+
+
+CORPORA = {
+    "json": json_document,
+    "log": log_file,
+    "traceback": stack_trace,
+    "sql": sql_dump,
+    "hex": hex_text,
+}
@@ -0,0 +1,293 @@
+"""Soak test: hours of simulated clipboard churn, watching for resource growth.
+
+Drives a real ClipboardMonitor through the in-memory clipboard at a steady
+rate with a configurable payload mix, and samples RSS, thread count,
+pending timers, remembered writes, notifications, open Tk windows and
+handling latency percentiles. After a warm-up, any series that keeps
+growing is flagged and the run exits with status 1.
+
+    python -m benchmarks.soak --duration 3600 --rate 5
+    python -m benchmarks.soak --duration 600 --mix text=0.5,token=0.3,large=0.2 -o soak.json
+    python -m benchmarks.soak --ui          # needs a display; uses the real main window
+"""
+import argparse
+import base64
+import collections
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+
+from benchmarks.common import make_text, use_temporary_keyring
+
+DEFAULT_MIX = "text=0.6,token=0.3,large=0.05,garbage=0.05"
+POOL_SIZE = 32
+SEED = 4321
+# Fraction of samples ignored while caches, pools and allocators settle
+WARMUP_FRACTION = 0.25
+# A series is "growing" when this share of its steps never go down...
+MONOTONIC_SHARE = 0.8
+# ...and it rose by more than its tolerance overall
+TOLERANCES = {
+    "rss_mb": 8.0,
+    "threads": 0,
+    "timers": 2,
+    "pending_writes": 0,
+    "notifications": 0,
+    "notification_queue": 0,
+    "tk_windows": 0,
+    "ui_queue": 50,
+}
+
+
+def current_rss():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, but still only ever grows on a leak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def parse_mix(spec):
+    """Parse "text=0.6,token=0.4" into normalised weights"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, weight = item.partition("=")
+        if kind not in ("text", "token", "large", "garbage") or not weight:
+            raise ValueError(f"Invalid mix entry {item!r}")
+        weights[kind] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Mix weights must add up to more than zero")
+    return {kind: weight / total for kind, weight in weights.items()}
+
+
+class PayloadSource:
+    """Seeded payloads of each kind; every copy is a distinct string"""
+
+    def __init__(self, encryption, mix, large_size, seed=SEED):
+        self.rng = random.Random(seed)
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.counter = 0
+        texts = [make_text(self.rng.choice((10, 100, 1_000, 10_000))) for _ in range(POOL_SIZE)]
+        self.pools = {
+            "text": texts,
+            "token": [encryption.encrypt(text) for text in texts],
+            "large": [make_text(large_size)[:-8] for _ in range(4)],
+            "garbage": ["scg." + base64.urlsafe_b64encode(self.rng.randbytes(64)).decode().rstrip("=")
+                        for _ in range(POOL_SIZE)],
+        }
+
+    def next(self):
+        self.counter += 1
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        payload = self.rng.choice(self.pools[kind])
+        if kind in ("text", "large"):
+            # Unique plaintext, so nothing is deduplicated by the monitor
+            payload = f"{payload} #{self.counter}"
+        return kind, payload
+
+
+class Soak:
+    def __init__(self, args):
+        from clipboard_backend import MemoryBackend
+        from clipboard_monitor import ClipboardMonitor
+        from timer_service import get_timer_service
+
+        self.args = args
+        self.backend = MemoryBackend()
+        self.monitor = ClipboardMonitor(backend=self.backend)
+        self.timers = get_timer_service()
+        self.payloads = PayloadSource(self.monitor.encryption, parse_mix(args.mix),
+                                      int(args.large_mb * 1e6))
+        self.main_window = None
+        self.samples = []
+        self.copies = 0
+        self.kinds = collections.Counter()
+        self._latencies = []
+        self._latency_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = None
+
+        handle = self.monitor.handle_clipboard_change
+
+        def timed_handle(content, signature=None):
+            start = time.perf_counter()
+            try:
+                return handle(content, signature)
+            finally:
+                with self._latency_lock:
+                    self._latencies.append(time.perf_counter() - start)
+
+        self.monitor.handle_clipboard_change = timed_handle
+
+    def attach_ui(self):
+        from main_window import MainWindow
+        self.main_window = MainWindow()
+        self.main_window.set_clipboard_monitor(self.monitor)
+        self.monitor.set_main_window(self.main_window)
+
+    def drive(self):
+        """Copy payloads at the configured rate until stopped"""
+        interval = 1.0 / self.args.rate
+        next_copy = time.monotonic()
+        while not self._stop.is_set():
+            kind, payload = self.payloads.next()
+            self.backend.copy(payload)
+            self.copies += 1
+            self.kinds[kind] += 1
+            del payload
+            # Poisson arrivals: users copy in clumps, not on a metronome
+            next_copy += self.payloads.rng.expovariate(1.0 / interval)
+            self._stop.wait(max(0.0, next_copy - time.monotonic()))
+
+    def tk_windows(self):
+        if self.main_window is None:
+            return 0
+        import tkinter as tk
+        return sum(1 for widget in self.main_window.root.winfo_children()
+                   if isinstance(widget, tk.Toplevel) and widget.winfo_viewable())
+
+    def sample(self):
+        with self._latency_lock:
+            latencies = sorted(self._latencies)
+            self._latencies = []
+
+        def percentile(q):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000, 3)
+
+        notification = self.monitor.notification
+        sample = {
+            "elapsed_s": round(time.monotonic() - self._started, 1),
+            "copies": self.copies,
+            "rss_mb": round(current_rss() / 1e6, 1),
+            "threads": threading.active_count(),
+            "timers": len(self.timers),
+            "pending_writes": len(self.monitor._pending_writes),
+            "notifications": len(notification.notifications),
+            "notification_queue": len(notification._pending),
+            "tk_windows": self.tk_windows(),
+            "ui_queue": len(self.main_window.dispatcher._queue) if self.main_window else 0,
+            "handled": len(latencies),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+        self.samples.append(sample)
+        print(" ".join(f"{key}={value}" for key, value in sample.items()), flush=True)
+
+    def run(self):
+        self._started = time.monotonic()
+        monitor_thread = threading.Thread(target=self.monitor.start_monitoring, name="monitor",
+                                          daemon=True)
+        driver = threading.Thread(target=self.drive, name="driver", daemon=True)
+        monitor_thread.start()
+        driver.start()
+        deadline = self._started + self.args.duration
+        interval_ms = int(self.args.sample_interval * 1000)
+
+        if self.main_window is None:
+            while time.monotonic() < deadline:
+                time.sleep(min(self.args.sample_interval, max(0.0, deadline - time.monotonic())))
+                self.sample()
+        else:
+            # Tk is only touched from its own thread, so sample from after()
+            def tick():
+                self.sample()
+                if time.monotonic() >= deadline:
+                    self.main_window.root.quit()
+                else:
+                    self.main_window.root.after(interval_ms, tick)
+
+            self.main_window.root.after(interval_ms, tick)
+            self.main_window.run()
+
+        self._stop.set()
+        driver.join(5)
+        self.monitor.stop_monitoring()
+        monitor_thread.join(5)
+        self.timers.cancel(self.monitor.clear_timer)
+
+
+def detect_growth(samples, key, tolerance, warmup=WARMUP_FRACTION):
+    """Return (growing, increase) for one series, ignoring the warm-up samples"""
+    values = [sample[key] for sample in samples[int(len(samples) * warmup):]
+              if sample[key] is not None]
+    if len(values) < 4:
+        return False, 0
+    steps = [later - earlier for earlier, later in zip(values, values[1:])]
+    share_up = sum(1 for step in steps if step >= 0) / len(steps)
+    increase = values[-1] - values[0]
+    return share_up >= MONOTONIC_SHARE and increase > tolerance, increase
+
+
+def report(samples, tolerances):
+    """Print a per-series verdict; returns the names of growing series"""
+    growing = []
+    print(f"\n{'series':<20} {'first':>10} {'last':>10} {'change':>10}  verdict")
+    for key, tolerance in tolerances.items():
+        flagged, increase = detect_growth(samples, key, tolerance)
+        first = samples[int(len(samples) * WARMUP_FRACTION)][key] if samples else None
+        last = samples[-1][key] if samples else None
+        if flagged:
+            growing.append(key)
+        print(f"{key:<20} {first!s:>10} {last!s:>10} {increase:>+10.1f}  "
+              f"{'GROWING' if flagged else 'ok'}")
+    for quantile in ("p50_ms", "p95_ms", "p99_ms"):
+        values = [sample[quantile] for sample in samples if sample[quantile] is not None]
+        if values:
+            print(f"{quantile:<20} {values[0]:>10} {values[-1]:>10} "
+                  f"{'max ' + str(max(values)):>10}")
+    return growing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Secure Clipboard soak test")
+    parser.add_argument("--duration", type=float, default=600, help="seconds to run (default 600)")
+    parser.add_argument("--rate", type=float, default=5, help="copies per second (default 5)")
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help=f"payload kinds and weights (default {DEFAULT_MIX})")
+    parser.add_argument("--large-mb", type=float, default=1.0, help="size of large payloads")
+    parser.add_argument("--sample-interval", type=float, default=10.0,
+                        help="seconds between samples (default 10)")
+    parser.add_argument("--rss-tolerance-mb", type=float, default=TOLERANCES["rss_mb"])
+    parser.add_argument("--ui", action="store_true",
+                        help="attach the real main window and notifications (needs a display)")
+    parser.add_argument("-o", "--output", help="write samples and verdicts as JSON")
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.disable(logging.WARNING)
+    use_temporary_keyring()
+    soak = Soak(args)
+    if args.ui:
+        soak.attach_ui()
+    soak.run()
+
+    tolerances = dict(TOLERANCES, rss_mb=args.rss_tolerance_mb)
+    growing = report(soak.samples, tolerances)
+    print(f"\n{soak.copies} copies in {args.duration:.0f}s: "
+          + ", ".join(f"{kind} {count}" for kind, count in sorted(soak.kinds.items())))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "samples": soak.samples, "growing": growing,
+                       "copies": dict(soak.kinds)}, f, indent=2)
+    if growing:
+        print("Growth detected in: " + ", ".join(growing))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
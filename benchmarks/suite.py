@@ -0,0 +1,333 @@
+"""Reproducible benchmark suite for the crypto and clipboard monitor hot paths.
+
+Runs without a display: the monitor uses the in-memory clipboard backend and
+keys live in a throwaway keyring. Results are written as JSON and can be
+compared against an earlier run, which fails the run on regressions.
+
+    python -m benchmarks.suite -o before.json
+    python -m benchmarks.suite -o after.json --baseline before.json
+    python -m benchmarks.suite --quick --only crypto
+
+Cases:
+  crypto   encrypt, decrypt and is_encrypted for plaintext, token and
+           garbage (token-shaped but unauthentic) inputs, 10 B to 100 MB,
+           with log-like text and with random base64 payloads; only the
+           latter stay above the chunk threshold after compression, so
+           they are what exercises the parallel segment pipeline
+           (encrypt_uncompressed/decrypt_uncompressed skip zlib entirely)
+  monitor  copy -> encrypted clipboard latency through a running monitor
+  burst    bursts of mixed copies replayed through handle_clipboard_change
+"""
+import argparse
+import base64
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import make_random_text, make_text, measure_samples, use_temporary_keyring
+
+SUITE_SIZES = [10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000]
+QUICK_MAX_SIZE = 1_000_000
+# Monitor round trips copy through a live thread; beyond this they are slow
+MONITOR_MAX_SIZE = 10_000_000
+INPUT_KINDS = ("plaintext", "token", "garbage")
+# "text" compresses to almost nothing; "random" is incompressible
+PAYLOAD_KINDS = ("text", "random")
+BURST_LENGTH = 200
+BURST_SIZES = [10, 100, 1_000, 10_000, 100_000]
+REGRESSION_THRESHOLD = 0.10
+SEED = 1234
+SCHEMA_VERSION = 2
+
+
+def sample_budget(size, quick):
+    """(min_time, max_runs) so large payloads do not dominate the run"""
+    min_time = 0.05 if quick else 0.2
+    if size >= 10_000_000:
+        return 0.0, 3
+    if size >= 1_000_000:
+        return min_time, 20
+    return min_time, 2000
+
+
+def summarize(name, kind, size, durations, payload="text"):
+    durations = sorted(durations)
+    median = statistics.median(durations)
+    return {
+        "name": name,
+        "input": kind,
+        "payload": payload,
+        "size": size,
+        "runs": len(durations),
+        "median_s": median,
+        "p95_s": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+        "min_s": durations[0],
+        "throughput_mb_s": round(size / median / 1e6, 2) if median else None,
+    }
+
+
+def timed_samples(func, *args, min_time=0.2, max_runs=1000):
+    """measure_samples with the collector paused, as timeit does"""
+    gc.collect()
+    gc.disable()
+    try:
+        return measure_samples(func, *args, min_time=min_time, max_runs=max_runs)
+    finally:
+        gc.enable()
+
+
+def make_garbage(token, seed):
+    """Token with the same prefix and length whose body fails authentication"""
+    prefix, body = token[:4], token[4:]
+    encode = base64.b85encode if prefix == "scg:" else base64.urlsafe_b64encode
+    # Keep the header so the garbage takes the full decode-and-verify path
+    keep = min(len(body), 8)
+    noise = encode(random.Random(seed).randbytes(len(body))).decode().rstrip("=")
+    return prefix + body[:keep] + noise[:len(body) - keep]
+
+
+def make_payload(payload, size):
+    if payload == "random":
+        return make_random_text(size, SEED + size)
+    return make_text(size)
+
+
+def crypto_cases(encryption, sizes, quick):
+    for payload in PAYLOAD_KINDS:
+        for size in sizes:
+            plaintext = make_payload(payload, size)
+            token = encryption.encrypt(plaintext)
+            assert encryption.decrypt(token) == plaintext
+            garbage = make_garbage(token, SEED + size)
+            inputs = {"plaintext": plaintext, "token": token, "garbage": garbage}
+            min_time, max_runs = sample_budget(size, quick)
+
+            yield summarize("encrypt", "plaintext", size,
+                            timed_samples(encryption.encrypt, plaintext, min_time=min_time,
+                                          max_runs=max_runs), payload)
+            yield summarize("decrypt", "token", size,
+                            timed_samples(encryption.decrypt, token, min_time=min_time,
+                                          max_runs=max_runs), payload)
+            for kind in INPUT_KINDS:
+                yield summarize("is_encrypted", kind, size,
+                                timed_samples(encryption.is_encrypted, inputs[kind],
+                                              min_time=min_time, max_runs=max_runs), payload)
+            if payload == "random":
+                # Cipher and segment pipeline alone, without the zlib pass
+                raw_token = encryption.encrypt(plaintext, compression="none")
+                yield summarize("encrypt_uncompressed", "plaintext", size,
+                                timed_samples(encryption.encrypt, plaintext, None, None, "none",
+                                              min_time=min_time, max_runs=max_runs), payload)
+                yield summarize("decrypt_uncompressed", "token", size,
+                                timed_samples(encryption.decrypt, raw_token, min_time=min_time,
+                                              max_runs=max_runs), payload)
+                del raw_token
+            del plaintext, token, garbage, inputs
+
+
+def monitor_cases(sizes, quick):
+    """Latency from a copy until the monitor has written the token back"""
+    from clipboard_backend import MemoryBackend
+    from clipboard_monitor import ClipboardMonitor
+
+    class RecordingBackend(MemoryBackend):
+        """Signals when the monitor thread writes to the clipboard"""
+
+        def __init__(self):
+            super().__init__()
+            self.written = threading.Event()
+            self.driver = threading.current_thread()
+
+        def copy(self, text):
+            super().copy(text)
+            if threading.current_thread() is not self.driver:
+                self.written.set()
+
+    backend = RecordingBackend()
+    monitor = ClipboardMonitor(backend=backend)
+    thread = threading.Thread(target=monitor.start_monitoring, daemon=True)
+    thread.start()
+
+    def round_trip(payload):
+        backend.written.clear()
+        backend.copy(payload)
+        if not backend.written.wait(60):
+            raise RuntimeError("Monitor did not encrypt the copied text")
+
+    try:
+        for size in sizes:
+            payload = make_text(size)
+            min_time, max_runs = sample_budget(size, quick)
+            round_trip(payload)
+            yield summarize("monitor_round_trip", "plaintext", size,
+                            measure_samples(round_trip, payload, min_time=min_time,
+                                            max_runs=min(max_runs, 500)))
+    finally:
+        monitor.stop_monitoring()
+        thread.join(5)
+        monitor.timers.cancel(monitor.clear_timer)
+
+
+def burst_cases(encryption, quick):
+    """Replay bursts of mixed copies straight through handle_clipboard_change"""
+    from clipboard_backend import MemoryBackend
+    from clipboard_monitor import ClipboardMonitor
+
+    rng = random.Random(SEED)
+    payloads = []
+    for index in range(BURST_LENGTH // (4 if quick else 1)):
+        text = make_text(rng.choice(BURST_SIZES)) + str(index)
+        # Roughly a third of copies are tokens being pasted back
+        payloads.append(encryption.encrypt(text) if rng.random() < 0.33 else text)
+
+    monitor = ClipboardMonitor(backend=MemoryBackend(), encryption=encryption)
+    durations = []
+    gc.collect()
+    for payload in payloads:
+        start = time.perf_counter()
+        monitor.handle_clipboard_change(payload)
+        durations.append(time.perf_counter() - start)
+    monitor.timers.cancel(monitor.clear_timer)
+
+    result = summarize("burst_replay", "mixed", sum(len(p) for p in payloads), durations)
+    result["total_s"] = sum(durations)
+    result["items_per_s"] = round(len(payloads) / result["total_s"], 1)
+    yield result
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    import cryptography
+    return {
+        "schema": SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "cryptography": cryptography.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def result_key(result):
+    # Schema 1 results predate payload kinds and were all log-like text
+    return result["name"], result["input"], result.get("payload", "text"), result["size"]
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Rows of (result, baseline median, ratio, verdict) for matching cases.
+
+    A case only counts as regressed or improved when its median and its
+    fastest run both moved past the threshold, which filters out most
+    scheduler noise in the threaded monitor cases.
+    """
+    previous = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None or not old["median_s"] or not old["min_s"]:
+            rows.append((result, None, None, "new"))
+            continue
+        ratio = result["median_s"] / old["median_s"]
+        min_ratio = result["min_s"] / old["min_s"]
+        if min(ratio, min_ratio) > 1 + threshold:
+            verdict = "REGRESSED"
+        elif max(ratio, min_ratio) < 1 - threshold:
+            verdict = "improved"
+        else:
+            verdict = "same"
+        rows.append((result, old["median_s"], ratio, verdict))
+    return rows
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+def print_results(results, rows=None):
+    verdicts = {result_key(row[0]): row for row in rows or []}
+    print(f"{'case':<20} {'input':>9} {'payload':>7} {'size':>11} {'runs':>5} {'median':>10} {'p95':>10} "
+          f"{'MB/s':>9}" + (f" {'baseline':>10} {'change':>8}  verdict" if rows else ""))
+    for result in results:
+        line = (f"{result['name']:<20} {result['input']:>9} {result['payload']:>7} "
+                f"{result['size']:>11,} {result['runs']:>5} "
+                f"{format_duration(result['median_s']):>10} {format_duration(result['p95_s']):>10} "
+                f"{result['throughput_mb_s'] or 0:>9.1f}")
+        row = verdicts.get(result_key(result))
+        if row:
+            _, old, ratio, verdict = row
+            change = f"{(ratio - 1) * 100:+.1f}%" if ratio else "-"
+            line += f" {format_duration(old):>10} {change:>8}  {verdict}"
+        print(line, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Secure Clipboard benchmark suite")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results from an earlier run")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    parser.add_argument("--only", choices=("crypto", "monitor", "burst"), action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"sizes up to {QUICK_MAX_SIZE:,} bytes and shorter sampling")
+    parser.add_argument("--max-size", type=int, help="largest payload size in bytes")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    use_temporary_keyring()
+    from encryption import Encryption
+
+    max_size = args.max_size or (QUICK_MAX_SIZE if args.quick else SUITE_SIZES[-1])
+    sizes = [size for size in SUITE_SIZES if size <= max_size]
+    groups = args.only or ["crypto", "monitor", "burst"]
+    encryption = Encryption()
+
+    results = []
+    if "crypto" in groups:
+        results.extend(crypto_cases(encryption, sizes, args.quick))
+    if "monitor" in groups:
+        results.extend(monitor_cases([size for size in sizes if size <= MONITOR_MAX_SIZE], args.quick))
+    if "burst" in groups:
+        results.extend(burst_cases(encryption, args.quick))
+
+    rows = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+    print_results(results, rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    regressions = [row for row in rows or [] if row[3] == "REGRESSED"]
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
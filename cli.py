@@ -0,0 +1,266 @@
+"""Encrypt and decrypt files and pipes with the Secure Clipboard keys.
+
+    python cli.py encrypt report.pdf -o report.pdf.scg
+    some-command | python cli.py encrypt > secret.txt
+    python cli.py decrypt secret.txt
+    python cli.py encrypt --batch ./exports -o ./encrypted --workers 4
+    python cli.py history --search invoice
+
+Output uses the clipboard token format, so a file encrypted here can be
+decrypted by copying its contents, and vice versa. Large regular files are
+memory-mapped and processed a chunk at a time in constant memory.
+"""
+import argparse
+import logging
+import mmap
+import os
+import stat
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from compression import CODECS
+from encryption import ENCODINGS, WRITE_ENGINES, Encryption
+from log_pipeline import setup_logging
+
+TOKEN_SUFFIX = ".scg"
+# Files smaller than this are read normally; mapping them is not worth it
+MMAP_MIN_SIZE = 64 * 1024
+# Consumed parts of a mapped file are released from memory in steps this big
+RELEASE_SIZE = 16 * 1024 * 1024
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+# Per-process Encryption for batch workers
+_worker_encryption = None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Secure Clipboard file and pipe encryption",
+                                     epilog="Reads stdin and writes stdout when no paths are given.")
+    parser.add_argument("--verbose", action="store_true", help="log progress to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command in ("encrypt", "decrypt"):
+        sub = commands.add_parser(command, help=f"{command} a file, a pipe or a directory")
+        sub.add_argument("input", nargs="?", default="-", help="input file (default: stdin)")
+        sub.add_argument("-o", "--output", default="-",
+                         help="output file, or output directory with --batch (default: stdout)")
+        sub.add_argument("--batch", metavar="DIR",
+                         help="process every file under DIR in parallel")
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                         help="processes for --batch (default: CPU count)")
+        if command == "encrypt":
+            sub.add_argument("--encoding", choices=[e for e in ENCODINGS if e != "legacy"],
+                             default="base64")
+            sub.add_argument("--engine", choices=WRITE_ENGINES, default=WRITE_ENGINES[0])
+            sub.add_argument("--compression", choices=list(CODECS), default="zlib")
+    history = commands.add_parser("history", help="list, show or search the clipboard history "
+                                                  "kept by secure_clipboard.py --history")
+    history.add_argument("--limit", type=int, default=20, help="entries to list (default 20)")
+    history.add_argument("--show", type=int, metavar="SEQ", help="print the text of one entry")
+    history.add_argument("--search", metavar="TEXT", help="newest entries containing TEXT")
+    history.add_argument("--clear", action="store_true",
+                         help="delete all history (stop the app first)")
+    return parser.parse_args(argv)
+
+
+def make_encryption(args):
+    if args.command == "encrypt":
+        return Encryption(encoding=args.encoding, engine=args.engine, compression=args.compression)
+    return Encryption()
+
+
+def _stream_reader(stream):
+    return stream.read
+
+
+def _mapped_reader(mapped, view):
+    """read(size) over a mapped file; slices are zero-copy.
+
+    Pages already consumed are dropped from the mapping as reading moves on,
+    so resident memory stays constant however large the file is.
+    """
+    position = 0
+    released = 0
+
+    def read(size):
+        nonlocal position, released
+        piece = view[position:position + size]
+        position += len(piece)
+        # Safe for a read-only file mapping: touched again, pages fault back in
+        done = position // mmap.PAGESIZE * mmap.PAGESIZE
+        if done - released >= RELEASE_SIZE and hasattr(mmap, 'MADV_DONTNEED'):
+            mapped.madvise(mmap.MADV_DONTNEED, released, done - released)
+            released = done
+        return piece
+
+    return read
+
+
+def process_stream(encryption, command, source, destination):
+    """Encrypt or decrypt one open binary file object into another"""
+    write = destination.write
+    try:
+        info = os.fstat(source.fileno())
+        mappable = stat.S_ISREG(info.st_mode) and info.st_size >= MMAP_MIN_SIZE
+    except (OSError, ValueError):
+        mappable = False
+
+    if not mappable:
+        if command == "encrypt":
+            encryption.encrypt_stream(_stream_reader(source), write)
+        else:
+            encryption.decrypt_stream(_stream_reader(source), write)
+        return
+
+    # Map the file so chunks are sliced straight from the page cache
+    with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        try:
+            if command == "encrypt":
+                encryption.encrypt_stream(_mapped_reader(mapped, view), write, sample=view)
+            else:
+                encryption.decrypt_stream(_mapped_reader(mapped, view), write)
+        finally:
+            view.release()
+
+
+def process_file(encryption, command, input_path, output_path):
+    """Process one path ("-" meaning stdin/stdout)"""
+    source = sys.stdin.buffer if input_path == "-" else open(input_path, "rb")
+    try:
+        if output_path == "-":
+            process_stream(encryption, command, source, sys.stdout.buffer)
+            if command == "encrypt" and sys.stdout.isatty():
+                sys.stdout.buffer.write(b"\n")
+            sys.stdout.buffer.flush()
+            return
+        # Write next to the target and rename, so failures leave no partial output
+        partial_path = output_path + ".partial"
+        try:
+            with open(partial_path, "wb") as destination:
+                process_stream(encryption, command, source, destination)
+            os.replace(partial_path, output_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.unlink(partial_path)
+            raise
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+
+
+def batch_output_path(command, input_root, output_root, path):
+    relative = os.path.relpath(path, input_root)
+    if command == "encrypt":
+        relative += TOKEN_SUFFIX
+    elif relative.endswith(TOKEN_SUFFIX):
+        relative = relative[:-len(TOKEN_SUFFIX)]
+    else:
+        relative += ".decrypted"
+    return os.path.join(output_root, relative)
+
+
+def _init_worker(command, encoding, engine, compression):
+    global _worker_encryption
+    # Forked workers inherit the parent's pipeline but not its writer thread
+    setup_logging(logging.WARNING)
+    if command == "encrypt":
+        _worker_encryption = Encryption(encoding=encoding, engine=engine, compression=compression)
+    else:
+        _worker_encryption = Encryption()
+
+
+def _batch_job(command, input_path, output_path):
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        process_file(_worker_encryption, command, input_path, output_path)
+        return input_path, None
+    except Exception as e:
+        return input_path, str(e)
+
+
+def run_batch(args):
+    """Process every file under args.batch across a process pool"""
+    if args.output == "-":
+        logging.error("--batch needs an output directory (-o DIR)")
+        return EXIT_FAILED
+    paths = []
+    for directory, _, files in os.walk(args.batch):
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if not name.endswith(".partial") and os.path.isfile(path):
+                paths.append(path)
+
+    worker_args = (args.command, getattr(args, "encoding", None),
+                   getattr(args, "engine", None), getattr(args, "compression", None))
+    failures = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), initializer=_init_worker,
+                             initargs=worker_args) as pool:
+        futures = [pool.submit(_batch_job, args.command, path,
+                               batch_output_path(args.command, args.batch, args.output, path))
+                   for path in paths]
+        for future in as_completed(futures):
+            path, error = future.result()
+            if error:
+                failures += 1
+                logging.error(f"Failed to {args.command} {path}: {error}")
+    logging.info(f"{args.command.capitalize()}ed {len(paths) - failures} of {len(paths)} files"
+                    f" into {args.output}")
+    return EXIT_FAILED if failures else EXIT_OK
+
+
+def run_history(args):
+    """List entries from the index, or decrypt the ones asked for"""
+    from history_store import HistoryStore
+    from timer_service import TimerService
+    # The running app owns the active segment, so only --clear opens it for writing.
+    # The private timer service never starts: retention is the app's job.
+    store = HistoryStore(timers=TimerService(), read_only=not args.clear)
+    try:
+        if args.clear:
+            store.clear()
+        elif args.show is not None:
+            text = store.get(args.show)
+            if text is None:
+                logging.error(f"History entry {args.show} not found or not decryptable")
+                return EXIT_FAILED
+            sys.stdout.write(text + "\n")
+        elif args.search:
+            for entry, text in store.search(args.search, args.limit):
+                print(f"{entry.seq:>8}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.timestamp))}"
+                      f"  {entry.kind:<9}  {text[:60].replace(chr(10), ' ')}")
+        else:
+            entries = store.recent(args.limit)
+            if not entries:
+                logging.warning("No clipboard history; start secure_clipboard.py with --history")
+            for entry in entries:
+                print(f"{entry.seq:>8}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.timestamp))}"
+                      f"  {entry.kind:<9}  {entry.chars:,} characters")
+        return EXIT_OK
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Logs go to stderr so stdout carries only the token or plaintext; batch
+    # runs write files, so their INFO summary is shown by default
+    batch = getattr(args, "batch", None)
+    setup_logging(logging.INFO if args.verbose or batch else logging.WARNING)
+    if args.command == "history":
+        return run_history(args)
+    if args.batch:
+        return run_batch(args)
+    try:
+        process_file(make_encryption(args), args.command, args.input, args.output)
+        return EXIT_OK
+    except Exception as e:
+        logging.error(f"Failed to {args.command} {args.input}: {e}")
+        return EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
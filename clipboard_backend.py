@@ -0,0 +1,259 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sys
+import threading
+import pyperclip
+
+# XFixes selection event masks (see X11/extensions/Xfixes.h)
+XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK = 1 << 0
+XFIXES_SELECTION_WINDOW_DESTROY_NOTIFY_MASK = 1 << 1
+XFIXES_SELECTION_CLIENT_CLOSE_NOTIFY_MASK = 1 << 2
+XFIXES_SELECTION_NOTIFY = 0
+
+
+class ClipboardBackend:
+    """Base class for the different ways of reading and watching the clipboard"""
+
+    name = "base"
+    # True when wait_for_change() only returns once the clipboard really changed
+    event_driven = False
+
+    def paste(self):
+        """Return the current clipboard text"""
+        raise NotImplementedError
+
+    def copy(self, text):
+        """Replace the clipboard text"""
+        raise NotImplementedError
+
+    def wait_for_change(self, timeout=None):
+        """Block until the clipboard may have changed or the timeout elapses.
+
+        Returns True when the caller should read the clipboard.
+        """
+        raise NotImplementedError
+
+    def wake(self):
+        """Interrupt a pending wait_for_change() call"""
+
+    def close(self):
+        """Release any resources held by the backend"""
+
+
+class PollingBackend(ClipboardBackend):
+    """Fallback backend that reads the clipboard through pyperclip on a timer"""
+
+    name = "polling"
+    event_driven = False
+
+    def __init__(self):
+        self._wake_event = threading.Event()
+
+    def paste(self):
+        return pyperclip.paste()
+
+    def copy(self, text):
+        pyperclip.copy(text)
+
+    def wait_for_change(self, timeout=None):
+        # Polling cannot know whether anything changed, so every elapsed
+        # interval asks the caller to read the clipboard again
+        woken = self._wake_event.wait(timeout)
+        self._wake_event.clear()
+        return not woken
+
+    def wake(self):
+        self._wake_event.set()
+
+
+class MemoryBackend(ClipboardBackend):
+    """In-process clipboard used for tests and headless benchmarks"""
+
+    name = "memory"
+    event_driven = True
+
+    def __init__(self, initial=''):
+        self._content = initial
+        self._generation = 0
+        self._seen_generation = 0
+        self._woken = False
+        self._condition = threading.Condition()
+
+    @property
+    def generation(self):
+        """Number of writes made to this clipboard so far"""
+        return self._generation
+
+    def paste(self):
+        with self._condition:
+            return self._content
+
+    def copy(self, text):
+        with self._condition:
+            self._content = text
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait_for_change(self, timeout=None):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._woken or self._generation != self._seen_generation,
+                timeout
+            )
+            self._woken = False
+            changed = self._generation != self._seen_generation
+            self._seen_generation = self._generation
+            return changed
+
+    def wake(self):
+        with self._condition:
+            self._woken = True
+            self._condition.notify_all()
+
+
+class _XEvent(ctypes.Union):
+    # XEvent is declared as a union padded to 24 longs
+    _fields_ = [("type", ctypes.c_int), ("pad", ctypes.c_long * 24)]
+
+
+class X11Backend(ClipboardBackend):
+    """Event-driven backend using XFixes selection owner notifications.
+
+    The X connection is only used to learn *when* the CLIPBOARD selection
+    changes owner; the contents are still read through pyperclip, but only
+    after a notification arrived. Works against any X server, including Xvfb.
+    """
+
+    name = "x11"
+    event_driven = True
+
+    def __init__(self, display_name=None):
+        self._display = None
+        # Created last; close() may run from an early exit before they exist
+        self._wake_read = self._wake_write = None
+        self._xlib = self._load_library("X11")
+        self._xfixes = self._load_library("Xfixes")
+        self._declare_prototypes()
+
+        name = display_name or os.environ.get("DISPLAY")
+        if not name:
+            raise RuntimeError("DISPLAY is not set")
+
+        self._display = self._xlib.XOpenDisplay(name.encode())
+        if not self._display:
+            raise RuntimeError(f"Could not open X display {name}")
+
+        event_base = ctypes.c_int()
+        error_base = ctypes.c_int()
+        if not self._xfixes.XFixesQueryExtension(
+                self._display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            self.close()
+            raise RuntimeError("XFixes extension is not available")
+        self._selection_notify = event_base.value + XFIXES_SELECTION_NOTIFY
+
+        root = self._xlib.XDefaultRootWindow(self._display)
+        clipboard_atom = self._xlib.XInternAtom(self._display, b"CLIPBOARD", False)
+        self._xfixes.XFixesSelectSelectionInput(
+            self._display, root, clipboard_atom,
+            XFIXES_SET_SELECTION_OWNER_NOTIFY_MASK
+            | XFIXES_SELECTION_WINDOW_DESTROY_NOTIFY_MASK
+            | XFIXES_SELECTION_CLIENT_CLOSE_NOTIFY_MASK
+        )
+        self._xlib.XFlush(self._display)
+
+        self._fd = self._xlib.XConnectionNumber(self._display)
+        self._wake_read, self._wake_write = os.pipe()
+        logging.info(f"X11 clipboard backend listening on display {name}")
+
+    @staticmethod
+    def _load_library(name):
+        path = ctypes.util.find_library(name)
+        if not path:
+            raise RuntimeError(f"lib{name} not found")
+        return ctypes.CDLL(path)
+
+    def _declare_prototypes(self):
+        xlib, xfixes = self._xlib, self._xfixes
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        xlib.XInternAtom.restype = ctypes.c_ulong
+        xlib.XFlush.argtypes = [ctypes.c_void_p]
+        xlib.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        xlib.XPending.argtypes = [ctypes.c_void_p]
+        xlib.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XEvent)]
+        xfixes.XFixesQueryExtension.argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)
+        ]
+        xfixes.XFixesSelectSelectionInput.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong
+        ]
+
+    def paste(self):
+        return pyperclip.paste()
+
+    def copy(self, text):
+        pyperclip.copy(text)
+
+    def _drain_events(self):
+        """Consume queued X events and report whether the selection changed"""
+        changed = False
+        event = _XEvent()
+        while self._xlib.XPending(self._display):
+            self._xlib.XNextEvent(self._display, ctypes.byref(event))
+            if event.type == self._selection_notify:
+                changed = True
+        return changed
+
+    def wait_for_change(self, timeout=None):
+        if self._drain_events():
+            return True
+
+        readable, _, _ = select.select([self._fd, self._wake_read], [], [], timeout)
+        if self._wake_read in readable:
+            os.read(self._wake_read, 64)
+        if self._fd in readable:
+            return self._drain_events()
+        return False
+
+    def wake(self):
+        try:
+            os.write(self._wake_write, b"\0")
+        except OSError:
+            pass
+
+    def close(self):
+        if self._display:
+            self._xlib.XCloseDisplay(self._display)
+            self._display = None
+            for fd in (self._wake_read, self._wake_write):
+                if fd is not None:
+                    os.close(fd)
+            logging.info("X11 clipboard backend closed")
+
+
+def create_backend(name="auto"):
+    """Create a clipboard backend by name, falling back to polling.
+
+    ``auto`` picks the X11 event backend when a display is available and
+    the XFixes extension can be used, and the polling backend otherwise.
+    """
+    if name == "memory":
+        return MemoryBackend()
+    if name == "polling":
+        return PollingBackend()
+    if name == "x11" or (name == "auto" and sys.platform.startswith("linux")
+                          and os.environ.get("DISPLAY")):
+        try:
+            return X11Backend()
+        except Exception as e:
+            if name == "x11":
+                raise
+            logging.warning(f"X11 clipboard events unavailable, falling back to polling: {e}")
+    return PollingBackend()
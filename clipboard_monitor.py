@@ -1,31 +1,92 @@
+import collections
+import hashlib
 import threading
 import time
-import pyperclip
 import logging
+from clipboard_backend import create_backend
 from encryption import Encryption
-from key_manager import KeyManager
+from history_store import KIND_DECRYPTED, KIND_ENCRYPTED
+from key_manager import get_key_manager
+from log_pipeline import log_event
+from metrics import CLIPBOARD_BYTES, CLIPBOARD_EVENTS, CLIPBOARD_WRITES, ERRORS, STAGE_SECONDS
 from notification import NotificationWindow
+from poll_scheduler import AdaptivePollScheduler
+from timer_service import get_timer_service
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# How often to re-check state (force decrypt, shutdown) while waiting on events
+EVENT_WAIT_TIMEOUT = 1.0
+# Own writes remembered for echo suppression; older ones can no longer echo
+MAX_PENDING_WRITES = 8
+# Contents longer than this (in characters) are left alone
+MAX_CONTENT_SIZE = 256 * 1024 * 1024
+# Above this size only a preview is passed to the UI and notifications
+LARGE_CONTENT_SIZE = 1024 * 1024
+PREVIEW_LENGTH = 2000
+# Characters hashed per step, so no full encoded copy is ever made
+DIGEST_CHUNK = 1024 * 1024
+
+
+def content_digest(content):
+    """Short digest used to recognise clipboard contents without keeping them"""
+    digest = hashlib.blake2b(digest_size=16)
+    for start in range(0, len(content), DIGEST_CHUNK):
+        digest.update(content[start:start + DIGEST_CHUNK].encode('utf-8', 'surrogatepass'))
+    return digest.digest()
+
+
+def content_signature(content):
+    """(length, digest) of clipboard content.
+
+    The whole content is always hashed: an unchanged clipboard has the
+    same length, and a changed one needs its digest for echo detection
+    anyway. The length only makes mismatching tuples compare faster.
+    """
+    return len(content), content_digest(content)
+
+
+def make_preview(text, limit=PREVIEW_LENGTH):
+    """Truncate text for display so the UI never holds a huge copy"""
+    if text is None or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text):,} characters]"
 
 class ClipboardMonitor:
-    def __init__(self):
-        self.previous_content = ''
-        self.encryption = Encryption()
-        self.key_manager = KeyManager()
+    def __init__(self, backend=None, scheduler=None, timers=None,
+                 max_content_size=MAX_CONTENT_SIZE, large_content_size=LARGE_CONTENT_SIZE,
+                 verify_access=True, encryption=None, history=None):
+        self.backend = backend or create_backend()
+        self.scheduler = scheduler or AdaptivePollScheduler()
+        self.timers = timers or get_timer_service()
+        self.running = False
+        self._stop_event = threading.Event()
+        self.max_content_size = max_content_size
+        self.large_content_size = large_content_size
+        # Signature of the last content seen; the content itself is not retained
+        self.previous_signature = content_signature('')
+        # signature -> write generation of clipboard contents we wrote ourselves
+        self._pending_writes = collections.OrderedDict()
+        self._write_generation = 0
+        self._write_lock = threading.Lock()
+        self.suppressed_echoes = 0
+        self.key_manager = get_key_manager()
+        self.encryption = encryption or Encryption(key_manager=self.key_manager)
+        # Optional HistoryStore; appends happen on its own writer thread
+        self.history = history
         self.clear_timer = None
         self.force_decrypt = False
         self.force_decrypt_timer = None
         self.notification = NotificationWindow()
         self.main_window = None
-        self._verify_clipboard_access()
+        # Staged startup probes the backend in parallel and skips this
+        if verify_access:
+            self._verify_clipboard_access()
         logging.info("ClipboardMonitor initialized")
 
     def _verify_clipboard_access(self):
         """Verify that clipboard access is available"""
         try:
-            pyperclip.paste()
-            logging.info("Clipboard access verified")
+            self.backend.paste()
+            logging.info(f"Clipboard access verified ({self.backend.name} backend)")
         except Exception as e:
             logging.error(f"Clipboard access failed: {e}")
             raise RuntimeError(
@@ -38,102 +99,207 @@ class ClipboardMonitor:
     def start_monitoring(self):
         """Start monitoring the clipboard for changes"""
         logging.info("Starting clipboard monitoring")
-        consecutive_errors = 0
+        self.running = True
+        self._stop_event.clear()
+        # Read once up front so content copied before startup is handled too
+        check_clipboard = True
 
-        while True:
+        while self.running:
             try:
-                current_content = pyperclip.paste()
+                if check_clipboard:
+                    read_started = time.perf_counter()
+                    current_content = self.backend.paste()
+                    signature = content_signature(current_content)
+                    if self._consume_own_write(signature):
+                        changed = False
+                    else:
+                        changed = bool(current_content) and signature != self.previous_signature
+                    STAGE_SECONDS.labels("detect").observe(time.perf_counter() - read_started)
+                    self.scheduler.record_poll(changed, self.backend.event_driven)
 
-                if current_content != self.previous_content and current_content:
-                    logging.info("Clipboard content changed")
-                    self.handle_clipboard_change(current_content)
-                    consecutive_errors = 0
+                    if changed:
+                        self.handle_clipboard_change(current_content, signature)
+                    # Drop the reference before waiting so only the clipboard owns it
+                    current_content = None
 
                 if self.force_decrypt:
                     self.manual_decrypt()
 
-                time.sleep(0.1)  # Short delay for better performance
+                # Event-driven backends block until the selection changes;
+                # the timeout only bounds how late force decrypt is noticed
+                if self.backend.event_driven and not self.force_decrypt:
+                    timeout = EVENT_WAIT_TIMEOUT
+                else:
+                    timeout = self.scheduler.next_interval()
+                check_clipboard = self.backend.wait_for_change(timeout)
             except Exception as e:
-                logging.error(f"Error monitoring clipboard: {e}")
-                consecutive_errors += 1
-                if consecutive_errors > 5:
-                    logging.error("Multiple consecutive clipboard errors, sleeping...")
-                    time.sleep(2)
-                    consecutive_errors = 0
-
-    def handle_clipboard_change(self, content):
+                self.scheduler.record_error()
+                ERRORS.labels("monitor").inc()
+                delay = self.scheduler.next_interval()
+                logging.error(f"Error monitoring clipboard: {e} (retrying in {delay:.2f}s)")
+                self._stop_event.wait(delay)
+                check_clipboard = True
+
+        self.backend.close()
+        logging.info(f"Clipboard monitoring stopped: {self.get_poll_stats()}, "
+                     f"suppressed echoes: {self.suppressed_echoes}")
+
+    def stop_monitoring(self):
+        """Stop the monitoring loop and release the clipboard backend"""
+        self.running = False
+        self._stop_event.set()
+        self.backend.wake()
+
+    def get_poll_stats(self):
+        """Return polling counters (polls per minute, detection latency)"""
+        return self.scheduler.stats()
+
+    def write_clipboard(self, text):
+        """Write to the clipboard and remember the write so its echo is skipped"""
+        started = time.perf_counter()
+        signature = content_signature(text)
+        with self._write_lock:
+            self._write_generation += 1
+            self._pending_writes[signature] = self._write_generation
+            self._pending_writes.move_to_end(signature)
+            while len(self._pending_writes) > MAX_PENDING_WRITES:
+                self._pending_writes.popitem(last=False)
+            self.previous_signature = signature
+        self.backend.copy(text)
+        STAGE_SECONDS.labels("clipboard_write").observe(time.perf_counter() - started)
+        CLIPBOARD_WRITES.inc()
+        CLIPBOARD_BYTES.labels("out").inc(len(text))
+
+    def _consume_own_write(self, signature):
+        """Return True (once) if content_signature() matches one of our own writes"""
+        with self._write_lock:
+            if not self._pending_writes:
+                return False
+            generation = self._pending_writes.pop(signature, None)
+            if generation is None:
+                return False
+            # Writes older than the one observed were overwritten and cannot echo
+            for pending_signature, pending in list(self._pending_writes.items()):
+                if pending < generation:
+                    del self._pending_writes[pending_signature]
+            self.suppressed_echoes += 1
+            return True
+
+    def handle_clipboard_change(self, content, signature=None):
         """Handle clipboard content changes with enhanced visual feedback"""
         if not content:
             return
 
-        self.previous_content = content
-        logging.info("Processing clipboard content")
+        self.previous_signature = signature or content_signature(content)
+        CLIPBOARD_BYTES.labels("in").inc(len(content))
+        if len(content) > self.max_content_size:
+            CLIPBOARD_EVENTS.labels("rejected").inc()
+            log_event("clipboard.rejected", logging.WARNING, chars=len(content),
+                      limit=self.max_content_size)
+            self.notification.show_notification("error", "Clipboard content too large to encrypt")
+            return
 
+        # One structured event per change, with per-stage durations in ms
+        started = time.perf_counter()
+        fields = {"chars": len(content), "large": len(content) > self.large_content_size}
+        event = "clipboard.ignored"
+        level = logging.INFO
         try:
-            if self.encryption.is_encrypted(content):
-                logging.info("Detected encrypted content")
-                decrypted = self.encryption.decrypt(content)
-                if decrypted:
-                    logging.info("Successfully decrypted content")
-                    # Update main window's decryption display
+            result = self.encryption.classify(content)
+            classified = time.perf_counter()
+            fields["classify_ms"] = (classified - started) * 1000
+            STAGE_SECONDS.labels("classify").observe(classified - started)
+            if result.is_encrypted:
+                # An empty plaintext is still a successful decrypt
+                decrypted = result.plaintext
+                event = "clipboard.decrypted"
+                if self.history is not None:
+                    self.history.add(decrypted, KIND_DECRYPTED)
+                # Update main window's decryption display; its viewer
+                # shares this string and renders only what is visible
+                if self.main_window:
                     self.main_window.update_decrypt_display(decrypted)
-                    # Show decryption notification with the decrypted text
-                    self.notification.show_notification("decrypt", decrypted)
-                    # Keep the encrypted text in clipboard but show decrypted version
-                    pyperclip.copy(content)
+                # Show decryption notification with a preview of the text
+                self.notification.show_notification("decrypt", make_preview(decrypted))
+                # The encrypted text stays in the clipboard untouched
+            elif result.is_token:
+                # A token for an unknown key or a corrupted one: encrypting it
+                # again would bury it, so the clipboard is left alone
+                event = "clipboard.undecryptable"
+                level = logging.WARNING
+                self.notification.show_notification(
+                    "error", "Token could not be decrypted with any known key")
             else:
-                logging.info("Detected plain text, encrypting")
                 encrypted = self.encryption.encrypt(content)
+                crypted = time.perf_counter()
+                fields["crypt_ms"] = (crypted - classified) * 1000
+                STAGE_SECONDS.labels("crypt").observe(crypted - classified)
                 if encrypted:
-                    logging.info("Successfully encrypted content")
-                    pyperclip.copy(encrypted)
+                    event = "clipboard.encrypted"
+                    if self.history is not None:
+                        self.history.add(content, KIND_ENCRYPTED)
+                    fields["token_chars"] = len(encrypted)
+                    self.write_clipboard(encrypted)
+                    del encrypted
+                    fields["write_ms"] = (time.perf_counter() - crypted) * 1000
                     # Show encryption notification
-                    self.notification.show_notification("encrypt", content)
+                    self.notification.show_notification("encrypt", make_preview(content))
                     # Clear decryption display since we're encrypting
-                    self.main_window.update_decrypt_display(None)
+                    if self.main_window:
+                        self.main_window.update_decrypt_display(None)
+                else:
+                    event = "clipboard.encrypt_failed"
 
             self.start_clear_timer()
+            fields["total_ms"] = (time.perf_counter() - started) * 1000
+            CLIPBOARD_EVENTS.labels(event.split(".", 1)[1]).inc()
+            log_event(event, level, **fields)
         except Exception as e:
-            logging.error(f"Error handling clipboard change: {e}")
+            fields["total_ms"] = (time.perf_counter() - started) * 1000
+            CLIPBOARD_EVENTS.labels("error").inc()
+            ERRORS.labels("monitor").inc()
+            log_event("clipboard.error", logging.ERROR, error=str(e), **fields)
             # Show error notification
             self.notification.show_notification("error")
 
     def set_main_window(self, main_window):
         """Set the main window reference"""
         self.main_window = main_window
+        self.notification.attach(main_window.root, main_window.dispatcher)
         logging.info("Main window reference set in ClipboardMonitor")
 
     def start_clear_timer(self):
         """Start timer to clear clipboard after 30 seconds"""
-        if self.clear_timer:
-            self.clear_timer.cancel()
-
-        self.clear_timer = threading.Timer(30.0, self.clear_clipboard)
-        self.clear_timer.start()
-        logging.info("Started clipboard clear timer")
+        self.clear_timer = self.timers.reschedule(self.clear_timer, 30.0, self.clear_clipboard)
+        logging.debug("Started clipboard clear timer")
 
     def clear_clipboard(self):
         """Clear the clipboard contents"""
-        pyperclip.copy('')
-        self.previous_content = ''
+        self.write_clipboard('')
         logging.info("Cleared clipboard contents")
 
     def toggle_force_decrypt(self):
         """Toggle force decrypt mode with visual feedback"""
-        self.force_decrypt = not self.force_decrypt
+        return self.set_force_decrypt(not self.force_decrypt)
+
+    def set_force_decrypt(self, enabled):
+        """Turn force decrypt mode on (auto-disabled after 10s) or off"""
+        self.force_decrypt = enabled
         status = "enabled" if self.force_decrypt else "disabled"
         logging.info(f"Force decrypt mode {status}")
 
         if self.force_decrypt:
-            if self.force_decrypt_timer:
-                self.force_decrypt_timer.cancel()
-            self.force_decrypt_timer = threading.Timer(10.0, self.disable_force_decrypt)
-            self.force_decrypt_timer.start()
+            self.scheduler.notify_activity()
+            self.force_decrypt_timer = self.timers.reschedule(
+                self.force_decrypt_timer, 10.0, self.disable_force_decrypt
+            )
             # Show mode change notification
             self.notification.show_notification("force_decrypt")
         else:
+            self.timers.cancel(self.force_decrypt_timer)
             # Clear decryption display when disabling force decrypt
-            self.main_window.update_decrypt_display(None)
+            if self.main_window:
+                self.main_window.update_decrypt_display(None)
         return self.force_decrypt
 
     def disable_force_decrypt(self):
@@ -144,12 +310,21 @@ class ClipboardMonitor:
     def manual_decrypt(self):
         """Manual decryption"""
         try:
-            content = pyperclip.paste()
-            if content and self.encryption.is_encrypted(content):
-                logging.info("Manual decryption attempt")
-                decrypted = self.encryption.decrypt(content)
-                if decrypted:
-                    logging.info("Manual decryption successful")
-                    pyperclip.copy(decrypted)
+            content = self.backend.paste()
+            if not content or len(content) > self.max_content_size:
+                return
+            started = time.perf_counter()
+            result = self.encryption.classify(content)
+            if result.is_encrypted:
+                self.write_clipboard(result.plaintext)
+                event, level = "force_decrypted", logging.INFO
+            elif result.is_token:
+                event, level = "undecryptable", logging.WARNING
+            else:
+                return
+            CLIPBOARD_EVENTS.labels(event).inc()
+            log_event(f"clipboard.{event}", level, chars=len(content),
+                      total_ms=(time.perf_counter() - started) * 1000)
         except Exception as e:
-            logging.error(f"Error in manual decryption: {e}")
\ No newline at end of file
+            logging.error(f"Error in manual decryption: {e}")
+            ERRORS.labels("monitor").inc()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import importlib
+import logging
+import zlib
+
+# Codec ids stored in bits 1-3 of the token header flags
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODEC_BZ2 = 3
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "lzma": CODEC_LZMA, "bz2": CODEC_BZ2}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODECS.items()}
+
+# Inputs below this size never shrink enough to pay for the codec
+MIN_COMPRESS_SIZE = 512
+# Bytes taken from the start, middle and end of the input for the estimate
+SAMPLE_SIZE = 1024
+# Skip compression when a sample does not shrink below this ratio
+MAX_SAMPLE_RATIO = 0.9
+# Refuse to inflate tokens beyond this size (decompression bombs)
+MAX_DECOMPRESSED_SIZE = 512 * 1024 * 1024
+# Input fed to the codec per step; output is appended to one growing buffer
+# instead of being assembled from blocks at the end (which doubles the peak)
+STREAM_CHUNK = 1024 * 1024
+
+
+def _module(codec):
+    """Import the stdlib module for a codec; lzma and bz2 are optional builds"""
+    name = CODEC_NAMES[codec]
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise ValueError(f"Compression codec {name} is not available: {e}")
+
+
+def compressor(codec):
+    """Incremental compressor (compress()/flush()) for a codec id"""
+    if codec == CODEC_ZLIB:
+        return zlib.compressobj(6)
+    module = _module(codec)
+    return module.LZMACompressor() if codec == CODEC_LZMA else module.BZ2Compressor()
+
+
+def decompressor(codec):
+    """Incremental decompressor for a codec id; see iter_decompress()"""
+    if codec == CODEC_ZLIB:
+        return zlib.decompressobj()
+    module = _module(codec)
+    return module.LZMADecompressor() if codec == CODEC_LZMA else module.BZ2Decompressor()
+
+
+def iter_decompress(decompressor, data, piece_size=STREAM_CHUNK):
+    """Feed data to a decompressor, yielding output at most piece_size at a time"""
+    if hasattr(decompressor, 'unconsumed_tail'):
+        # zlib keeps input it had no room to inflate in unconsumed_tail
+        while data and not decompressor.eof:
+            yield decompressor.decompress(data, piece_size)
+            data = decompressor.unconsumed_tail
+        return
+    # lzma and bz2 buffer that input internally until asked again
+    yield decompressor.decompress(data, piece_size)
+    while not decompressor.eof and not decompressor.needs_input:
+        yield decompressor.decompress(b'', piece_size)
+
+
+def is_compressible(data):
+    """Estimate compressibility by zlib-compressing a few small samples"""
+    size = len(data)
+    if size < MIN_COMPRESS_SIZE:
+        return False
+    if size <= 3 * SAMPLE_SIZE:
+        sample = bytes(data)
+    else:
+        middle = (size - SAMPLE_SIZE) // 2
+        sample = bytes(data[:SAMPLE_SIZE]) + bytes(data[middle:middle + SAMPLE_SIZE]) \
+            + bytes(data[-SAMPLE_SIZE:])
+    return len(zlib.compress(sample, 1)) < len(sample) * MAX_SAMPLE_RATIO
+
+
+def compress(data, codec_name):
+    """Compress data if worthwhile and return (codec id, data)"""
+    codec = CODECS.get(codec_name)
+    if codec is None:
+        raise ValueError(f"Unknown compression codec: {codec_name}")
+    if codec == CODEC_NONE or not is_compressible(data):
+        return CODEC_NONE, data
+
+    codec_compressor = compressor(codec)
+    view = memoryview(data)
+    compressed = bytearray()
+    for start in range(0, len(view), STREAM_CHUNK):
+        compressed += codec_compressor.compress(view[start:start + STREAM_CHUNK])
+    compressed += codec_compressor.flush()
+
+    if len(compressed) >= len(data):
+        logging.debug(f"{codec_name} did not shrink the payload, storing uncompressed")
+        return CODEC_NONE, data
+    return codec, compressed
+
+
+def decompress(data, codec, limit=MAX_DECOMPRESSED_SIZE):
+    """Inverse of compress(); refuses output larger than limit"""
+    if codec == CODEC_NONE:
+        return data
+    if codec not in CODEC_NAMES:
+        raise ValueError(f"Unknown compression codec id {codec}")
+
+    codec_decompressor = decompressor(codec)
+    view = memoryview(data)
+    result = bytearray()
+    for start in range(0, len(view), STREAM_CHUNK):
+        if codec_decompressor.eof:
+            break
+        # Asking for one byte more than the limit allows is enough to detect a bomb
+        result += codec_decompressor.decompress(view[start:start + STREAM_CHUNK],
+                                                limit + 1 - len(result))
+        if len(result) > limit:
+            raise ValueError(f"Decompressed payload exceeds {limit} bytes")
+    if not codec_decompressor.eof:
+        raise ValueError("Compressed payload is incomplete")
+    return result
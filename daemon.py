@@ -0,0 +1,318 @@
+"""Headless Secure Clipboard daemon.
+
+Serves encrypt/decrypt/status for local scripts and editors over a Unix
+domain socket, using the same keys as the desktop app. Only the crypto and
+key services are loaded: no tkinter, PIL or pystray.
+
+Every message is a frame:
+
+    length (4 bytes, big endian) | code (1 byte) | body (length bytes)
+
+Requests carry an OP_* code and UTF-8 text; responses carry a STATUS_*
+code and UTF-8 text (the token, the plaintext, JSON status or an error).
+A connection may send any number of requests; responses come back in
+order.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import time
+from encryption import Encryption
+from key_manager import get_key_manager
+from log_pipeline import add_logging_arguments, setup_logging_from_args
+from metrics import add_metrics_arguments, start_exporters_from_args
+
+FRAME_HEADER = struct.Struct('>IB')
+OP_ENCRYPT = 1
+OP_DECRYPT = 2
+OP_STATUS = 3
+STATUS_OK = 0
+STATUS_NOT_A_TOKEN = 1
+STATUS_ERROR = 2
+OP_NAMES = {OP_ENCRYPT: "encrypt", OP_DECRYPT: "decrypt", OP_STATUS: "status"}
+
+MAX_FRAME_SIZE = 256 * 1024 * 1024
+# Payloads up to this size are handled on the event loop; larger ones go to
+# worker threads so one big request does not stall every other client
+INLINE_PAYLOAD_SIZE = 64 * 1024
+SOCKET_NAME = "secureclip.sock"
+SO_PEERCRED_FORMAT = struct.Struct('3i')
+
+
+def default_socket_path():
+    """Per-user socket path: $XDG_RUNTIME_DIR if set, else a private temp dir"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = os.path.join(tempfile.gettempdir(), f"secureclip-{os.getuid()}")
+        os.makedirs(runtime_dir, mode=0o700, exist_ok=True)
+        check_private_dir(runtime_dir)
+    return os.path.join(runtime_dir, SOCKET_NAME)
+
+
+def check_private_dir(path):
+    """Refuse a shared-temp directory another user could have created or opened up"""
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise RuntimeError(f"{path} is not a directory (possibly a symlink); refusing to use it")
+    if info.st_uid != os.getuid():
+        raise RuntimeError(f"{path} is owned by uid {info.st_uid}, not {os.getuid()}; refusing to use it")
+    if stat.S_IMODE(info.st_mode) != 0o700:
+        raise RuntimeError(f"{path} has mode {stat.S_IMODE(info.st_mode):o}, not 700; refusing to use it")
+
+
+def peer_uid(sock):
+    """uid of the process at the other end of a Unix socket, or None if unknown"""
+    if sock is None or not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, SO_PEERCRED_FORMAT.size)
+    _, uid, _ = SO_PEERCRED_FORMAT.unpack(creds)
+    return uid
+
+
+class ClipboardDaemon:
+    def __init__(self, socket_path=None, encryption=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.key_manager = get_key_manager()
+        self.encryption = encryption or Encryption(key_manager=self.key_manager)
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.clients = 0
+        self._server = None
+        logging.info("ClipboardDaemon initialized")
+
+    async def start(self):
+        self._remove_stale_socket()
+        # Socket file is created owner-only; peers are also checked per connection
+        old_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        finally:
+            os.umask(old_umask)
+        logging.info(f"Daemon listening on {self.socket_path}")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        logging.info("Daemon stopped")
+
+    def _remove_stale_socket(self):
+        """Delete a socket left by a dead daemon; refuse to replace a live one"""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+            logging.info(f"Removed stale socket {self.socket_path}")
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another daemon is already listening on {self.socket_path}")
+
+    @staticmethod
+    def _peer_allowed(writer):
+        """Only serve processes of the user running the daemon"""
+        uid = peer_uid(writer.get_extra_info('socket'))
+        return uid is None or uid == os.getuid()
+
+    async def _handle_client(self, reader, writer):
+        if not self._peer_allowed(writer):
+            logging.warning("Rejected daemon connection from another user")
+            writer.close()
+            return
+        self.clients += 1
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                length, op = FRAME_HEADER.unpack(header)
+                if length > MAX_FRAME_SIZE:
+                    await self._send(writer, STATUS_ERROR, f"Frame exceeds {MAX_FRAME_SIZE} bytes")
+                    break
+                body = await reader.readexactly(length)
+                status, response = await self._dispatch(op, body)
+                await self._send(writer, status, response)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logging.info(f"Daemon client disconnected: {e}")
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    async def _send(self, writer, status, text):
+        body = text.encode('utf-8', 'surrogatepass')
+        writer.write(FRAME_HEADER.pack(len(body), status))
+        writer.write(body)
+        await writer.drain()
+
+    async def _dispatch(self, op, body):
+        self.requests += 1
+        if op not in OP_NAMES:
+            self.errors += 1
+            return STATUS_ERROR, f"Unknown operation {op}"
+        if len(body) <= INLINE_PAYLOAD_SIZE:
+            return self.handle_request(op, body)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.handle_request, op, body)
+
+    def handle_request(self, op, body):
+        """Run one request; returns (status, response text)"""
+        try:
+            if op == OP_STATUS:
+                return STATUS_OK, json.dumps(self.status())
+            text = body.decode('utf-8', 'surrogatepass')
+            if op == OP_ENCRYPT:
+                token = self.encryption.encrypt(text)
+                if token is None:
+                    self.errors += 1
+                    return STATUS_ERROR, "Encryption failed"
+                return STATUS_OK, token
+            result = self.encryption.classify(text)
+            if not result.is_token:
+                return STATUS_NOT_A_TOKEN, "Not a Secure Clipboard token"
+            if not result.is_encrypted:
+                self.errors += 1
+                return STATUS_ERROR, "Token did not decrypt with any known key"
+            return STATUS_OK, result.plaintext
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Error handling daemon {OP_NAMES[op]} request: {e}")
+            return STATUS_ERROR, str(e)
+
+    def status(self):
+        key_id = self.encryption.active_key_id
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.monotonic() - self.started_at, 1),
+            "engine": self.encryption.engine_name,
+            "encoding": self.encryption.encoding,
+            "compression": self.encryption.compression,
+            "key_id": key_id.hex() if key_id else None,
+            "team_mode": self.key_manager.team_mode,
+            "retired_keys": len(self.key_manager.get_retired_keys()),
+            "requests": self.requests,
+            "errors": self.errors,
+            "clients": self.clients,
+        }
+
+
+class DaemonError(Exception):
+    """The daemon answered a request with an error"""
+
+
+class DaemonClient:
+    """Blocking client for scripts; keeps one connection open for many requests"""
+
+    def __init__(self, socket_path=None, timeout=30.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.socket_path)
+        # Nothing is sent until the server is known to run as this user
+        uid = peer_uid(self.sock)
+        if uid is not None and uid != os.getuid():
+            self.sock.close()
+            raise DaemonError(f"Socket {self.socket_path} is served by uid {uid}, not this user")
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, op, text=""):
+        """Send one request and return (status, response text)"""
+        body = text.encode('utf-8', 'surrogatepass')
+        self.sock.sendall(FRAME_HEADER.pack(len(body), op) + body)
+        length, status = FRAME_HEADER.unpack(self._read_exactly(FRAME_HEADER.size))
+        return status, self._read_exactly(length).decode('utf-8', 'surrogatepass')
+
+    def _read_exactly(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if not count:
+                raise ConnectionError("Daemon closed the connection")
+            received += count
+        return buffer
+
+    def encrypt(self, text):
+        status, response = self.request(OP_ENCRYPT, text)
+        if status != STATUS_OK:
+            raise DaemonError(response)
+        return response
+
+    def decrypt(self, token):
+        """Return the plaintext, or None if token is not a token at all"""
+        status, response = self.request(OP_DECRYPT, token)
+        if status == STATUS_NOT_A_TOKEN:
+            return None
+        if status != STATUS_OK:
+            raise DaemonError(response)
+        return response
+
+    def status(self):
+        status, response = self.request(OP_STATUS)
+        if status != STATUS_OK:
+            raise DaemonError(response)
+        return json.loads(response)
+
+
+def run_daemon(socket_path=None, encryption=None):
+    """Ensure a key exists and serve until interrupted"""
+    key_manager = get_key_manager()
+    if not key_manager.get_encryption_key():
+        logging.info("No encryption key found, generating new key...")
+        key_manager.generate_new_key()
+    daemon = ClipboardDaemon(socket_path, encryption)
+    try:
+        asyncio.run(daemon.serve_forever())
+    except KeyboardInterrupt:
+        logging.info("Daemon interrupted")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Secure Clipboard daemon")
+    parser.add_argument("--socket", help="socket path (default: $XDG_RUNTIME_DIR/secureclip.sock)")
+    add_logging_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging_from_args(args)
+    start_exporters_from_args(args)
+    run_daemon(args.socket)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logging.error(f"Fatal error: {e}")
+        sys.exit(1)
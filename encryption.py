@@ -1,67 +1,764 @@
 import base64
 import logging
+import os
+import re
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from key_manager import KeyManager
+from compression import (CODEC_NONE, CODECS, compress, compressor, decompress, decompressor,
+                         is_compressible, iter_decompress)
+from key_manager import KEY_ID_SIZE, compute_key_id, get_key_manager
+from metrics import CRYPTO_BYTES, CRYPTO_SECONDS, ERRORS, size_class
+
+
+# Legacy tokens are base64(Fernet token). A Fernet token starts with the
+# version byte 0x80 followed by the high (zero) bytes of the timestamp, i.e.
+# "gAAAAA", which base64-encodes to this prefix.
+LEGACY_TOKEN_PREFIX = "Z0FBQUFB"
+# Shortest Fernet token: version(1) + timestamp(8) + IV(16) + one AES block(16)
+# + HMAC(32) = 73 bytes -> 100 base64 chars -> 136 chars once encoded again
+FERNET_MIN_LENGTH = 73
+LEGACY_MIN_TOKEN_LENGTH = 136
+LEGACY_TOKEN_ALPHABET = re.compile(r'[A-Za-z0-9_-]+={0,2}')
+
+# Compact tokens encode the binary token exactly once, behind a text prefix
+# naming the encoding. The binary token is
+#   version (1 byte) | engine (1 byte) | flags (1 byte) | engine payload
+# and the header is authenticated as associated data by the AEAD engines.
+FORMAT_VERSION = 1
+HEADER = struct.Struct('>BBB')
+ENGINE_FERNET = 0
+ENGINE_AES_GCM = 1
+ENGINE_CHACHA20 = 2
+BASE64_PREFIX = "scg."
+BASE85_PREFIX = "scg:"
+PREFIX_LENGTH = 4
+BASE64_ALPHABET = re.compile(r'[A-Za-z0-9_-]+')
+BASE85_ALPHABET = re.compile(r"[0-9A-Za-z!#$%&()*+\-;<=>?@^_`{|}~]+")
+AEAD_NONCE_SIZE = 12
+AEAD_TAG_SIZE = 16
+
+# Large payloads are split into independently sealed segments:
+#   header (flags & FLAG_CHUNKED) | chunk size (4) | token id (16) | segments
+# Every segment but the last holds exactly chunk size bytes of plaintext.
+# Each segment's associated data is the header, the chunk header, its index
+# and a final-segment flag, so segments cannot be reordered, dropped,
+# truncated or spliced in from another token.
+FLAG_CHUNKED = 0x01
+# Bits 1-3 hold the compression codec applied before encryption
+FLAG_CODEC_MASK = 0x0E
+FLAG_CODEC_SHIFT = 1
+# A key id (see key_manager.compute_key_id) follows the 3 header bytes and is
+# part of the authenticated header, so decrypt picks the key with one lookup
+FLAG_KEY_ID = 0x10
+KNOWN_FLAGS = FLAG_CHUNKED | FLAG_CODEC_MASK | FLAG_KEY_ID
+CHUNK_HEADER = struct.Struct('>I16s')
+SEGMENT_AAD = struct.Struct('>I?')
+CHUNK_THRESHOLD = 1024 * 1024
+DEFAULT_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+MIN_BLOB_LENGTH = HEADER.size + AEAD_NONCE_SIZE + AEAD_TAG_SIZE
+MIN_BASE64_LENGTH = PREFIX_LENGTH + (MIN_BLOB_LENGTH * 4 + 2) // 3
+MIN_BASE85_LENGTH = PREFIX_LENGTH + (MIN_BLOB_LENGTH * 5 + 3) // 4
+
+# "base64" is URL-safe and pastes anywhere; "base85" is ~7% denser but uses
+# punctuation some apps mangle; "legacy" writes the old double-encoded form
+ENCODINGS = ("base64", "base85", "legacy")
+# Large tokens are encoded and decoded in pieces of this many bytes (a
+# multiple of both 3 and 4) so no full-size temporary copies are made
+CODEC_CHUNK = 3 * 4 * 64 * 1024
+
+
+def token_format(text):
+    """Return the encoding of a token ("base64", "base85", "legacy") or None.
+
+    Only looks at the prefix, length and alphabet, so plain text is rejected
+    without decoding anything.
+    """
+    if not isinstance(text, str):
+        return None
+    if text.startswith(BASE64_PREFIX):
+        if len(text) >= MIN_BASE64_LENGTH and (len(text) - PREFIX_LENGTH) % 4 != 1 \
+                and BASE64_ALPHABET.fullmatch(text, PREFIX_LENGTH):
+            return "base64"
+        return None
+    if text.startswith(BASE85_PREFIX):
+        if len(text) >= MIN_BASE85_LENGTH and BASE85_ALPHABET.fullmatch(text, PREFIX_LENGTH):
+            return "base85"
+        return None
+    if text.startswith(LEGACY_TOKEN_PREFIX):
+        if len(text) >= LEGACY_MIN_TOKEN_LENGTH and not len(text) % 4 \
+                and LEGACY_TOKEN_ALPHABET.fullmatch(text):
+            return "legacy"
+    return None
+
+
+def encode_token(blob, encoding):
+    """Encode a binary token as clipboard text.
+
+    Encodes piecewise into one buffer, so the only full-size copy besides
+    the blob is the returned string.
+    """
+    if encoding == "base85":
+        prefix, encode = BASE85_PREFIX, base64.b85encode
+    else:
+        prefix, encode = BASE64_PREFIX, base64.urlsafe_b64encode
+    view = memoryview(blob)
+    encoded = bytearray(prefix.encode('ascii'))
+    for start in range(0, len(view), CODEC_CHUNK):
+        encoded += encode(view[start:start + CODEC_CHUNK])
+    if encoding != "base85":
+        del encoded[len(encoded.rstrip(b'=')):]
+    return encoded.decode('ascii')
+
+
+def decode_token(text, encoding):
+    """Decode compact token text back into the binary token"""
+    if encoding == "base85":
+        decode, step = base64.b85decode, CODEC_CHUNK // 4 * 5
+    else:
+        decode, step = base64.urlsafe_b64decode, CODEC_CHUNK // 3 * 4
+    blob = bytearray()
+    for start in range(PREFIX_LENGTH, len(text), step):
+        piece = text[start:start + step]
+        if encoding != "base85":
+            piece += '=' * (-len(piece) % 4)
+        blob += decode(piece)
+    return blob
+
+
+class TokenTextWriter:
+    """Incrementally encodes a binary token as token text for encrypt_stream()"""
+
+    def __init__(self, write, encoding):
+        if encoding not in ("base64", "base85"):
+            raise ValueError(f"Encoding {encoding} cannot be streamed")
+        self.write = write
+        self.encoding = encoding
+        # Full groups only, so no padding appears before the end of the token
+        self.group = 4 if encoding == "base85" else 3
+        self.encode = base64.b85encode if encoding == "base85" else base64.urlsafe_b64encode
+        self.buffer = bytearray()
+        write((BASE85_PREFIX if encoding == "base85" else BASE64_PREFIX).encode('ascii'))
+
+    def feed(self, data):
+        self.buffer += data
+        if len(self.buffer) >= CODEC_CHUNK:
+            usable = len(self.buffer) - len(self.buffer) % self.group
+            self.write(self.encode(memoryview(self.buffer)[:usable]))
+            del self.buffer[:usable]
+
+    def close(self):
+        encoded = self.encode(bytes(self.buffer))
+        self.write(encoded if self.encoding == "base85" else encoded.rstrip(b'='))
+        self.buffer = bytearray()
+
+
+class TokenTextReader:
+    """Incrementally decodes token text read from a stream for decrypt_stream()"""
+
+    WHITESPACE = b' \t\r\n'
+
+    def __init__(self, read):
+        self._read = read
+        self._text = bytearray()
+        self._binary = bytearray()
+        self._eof = False
+        self._fill_text(PREFIX_LENGTH)
+        prefix = bytes(self._text[:PREFIX_LENGTH])
+        if prefix == BASE64_PREFIX.encode():
+            self.encoding, self.group = "base64", 4
+        elif prefix == BASE85_PREFIX.encode():
+            self.encoding, self.group = "base85", 5
+        else:
+            self.encoding, self.group = None, None
+            return
+        del self._text[:PREFIX_LENGTH]
+
+    def _fill_text(self, size):
+        while len(self._text) < size and not self._eof:
+            data = self._read(CODEC_CHUNK)
+            if not data:
+                self._eof = True
+                break
+            # Tolerate line breaks and surrounding whitespace from pasting
+            self._text += bytes(data).translate(None, self.WHITESPACE)
+
+    def read_all_text(self):
+        """The remaining text, for tokens that cannot be streamed (legacy)"""
+        self._fill_text(float('inf'))
+        return self._text.decode('ascii', 'replace')
+
+    def read(self, size):
+        """Return up to size binary bytes; fewer only at the end of the token"""
+        while len(self._binary) < size:
+            self._fill_text(CODEC_CHUNK)
+            if not self._text:
+                break
+            usable = len(self._text) - len(self._text) % self.group
+            if self._eof:
+                usable = len(self._text)
+            if not usable:
+                continue
+            piece = bytes(self._text[:usable])
+            del self._text[:usable]
+            if self.encoding == "base85":
+                self._binary += base64.b85decode(piece)
+            else:
+                self._binary += base64.urlsafe_b64decode(piece + b'=' * (-len(piece) % 4))
+        result = bytes(self._binary[:size])
+        del self._binary[:size]
+        return result
+
+
+def read_exactly(read, size):
+    """Call read() until size bytes arrive or the stream ends"""
+    data = read(size)
+    if len(data) >= size or not data:
+        return data
+    data = bytearray(data)
+    while len(data) < size:
+        more = read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+class CipherEngine:
+    """Base class for the ciphers selectable through a token's engine byte"""
+
+    engine_id = None
+    name = None
+
+    def encrypt(self, data, associated_data):
+        """Return the engine payload for data"""
+        raise NotImplementedError
+
+    def decrypt(self, payload, associated_data):
+        """Return the plaintext bytes of an engine payload"""
+        raise NotImplementedError
+
+
+class FernetEngine(CipherEngine):
+    """AES-128-CBC + HMAC-SHA256 via Fernet, kept to read older tokens.
+
+    The payload is the raw (base64-decoded) Fernet token. Fernet has no
+    associated data, so the header is not bound to the ciphertext.
+    """
+
+    engine_id = ENGINE_FERNET
+    name = "fernet"
+
+    def __init__(self, key):
+        self.fernet = Fernet(key)
+
+    def encrypt(self, data, associated_data):
+        return base64.urlsafe_b64decode(self.fernet.encrypt(data))
+
+    def decrypt(self, payload, associated_data):
+        if len(payload) < FERNET_MIN_LENGTH:
+            raise ValueError("Fernet payload too short")
+        return self.fernet.decrypt(base64.urlsafe_b64encode(payload))
+
+
+class AEADEngine(CipherEngine):
+    """Single-pass authenticated encryption; payload is nonce | ciphertext+tag"""
+
+    aead_class = None
+
+    def __init__(self, key):
+        self.aead = self.aead_class(self.derive_subkey(key, self.name))
+
+    @staticmethod
+    def derive_subkey(key, name):
+        """Derive a 256-bit engine key from the stored (Fernet-format) key"""
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=f"SecureClipboard {name}".encode(),
+        ).derive(base64.urlsafe_b64decode(key))
+
+    def encrypt(self, data, associated_data):
+        nonce = os.urandom(AEAD_NONCE_SIZE)
+        return nonce + self.aead.encrypt(nonce, data, associated_data)
+
+    def decrypt(self, payload, associated_data):
+        if len(payload) < AEAD_NONCE_SIZE + AEAD_TAG_SIZE:
+            raise ValueError("AEAD payload too short")
+        nonce = bytes(payload[:AEAD_NONCE_SIZE])
+        return self.aead.decrypt(nonce, payload[AEAD_NONCE_SIZE:], associated_data)
+
+
+class AESGCMEngine(AEADEngine):
+    engine_id = ENGINE_AES_GCM
+    name = "aes-256-gcm"
+    aead_class = AESGCM
+
+
+class ChaCha20Engine(AEADEngine):
+    engine_id = ENGINE_CHACHA20
+    name = "chacha20-poly1305"
+    aead_class = ChaCha20Poly1305
+
+
+SEGMENT_WORKERS = min(32, os.cpu_count() or 1)
+_segment_executor = None
+_segment_executor_lock = threading.Lock()
+
+
+def segment_executor():
+    """Shared thread pool for segment crypto; cryptography releases the GIL"""
+    global _segment_executor
+    with _segment_executor_lock:
+        if _segment_executor is None:
+            _segment_executor = ThreadPoolExecutor(
+                max_workers=SEGMENT_WORKERS,
+                thread_name_prefix="segment-crypto"
+            )
+        return _segment_executor
+
+
+ENGINES = {engine.engine_id: engine for engine in (FernetEngine, AESGCMEngine, ChaCha20Engine)}
+ENGINE_NAMES = {engine.name: engine for engine in ENGINES.values()}
+# Engines new tokens may be written with; Fernet is only read
+WRITE_ENGINES = (AESGCMEngine.name, ChaCha20Engine.name)
+
+
+class KeyState:
+    """The active key id and its engines, swapped as one object on rotation.
+
+    Readers take self.state once per operation, so a rotation on another
+    thread can never pair one key's id with another key's engines.
+    """
+
+    __slots__ = ('key_id', 'engines', 'fernet', 'retired')
+
+    def __init__(self, key=None):
+        self.key_id = compute_key_id(key) if key else None
+        self.engines = Encryption._build_engines(key) if key else {}
+        self.fernet = self.engines[ENGINE_FERNET].fernet if key else None
+        # key id -> engines for retired keys, built on first use
+        self.retired = {}
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"KeyState.{name} is read-only")
+        object.__setattr__(self, name, value)
+
+    def engines_for_key_id(self, key_id, key_manager):
+        """Engines for the key a token names; a dict lookup, not a trial decrypt"""
+        if key_id == self.key_id:
+            return self.engines
+        engines = self.retired.get(key_id)
+        if engines is None:
+            key = key_manager.get_key_by_id(key_id)
+            if key is None:
+                return None
+            engines = self.retired[key_id] = Encryption._build_engines(key)
+        return engines
+
+
+class DecryptResult:
+    """Outcome of classifying clipboard text, reused instead of decrypting twice"""
+
+    __slots__ = ('is_token', 'plaintext')
+
+    def __init__(self, is_token, plaintext=None):
+        # is_token: the text has the shape of a token
+        # plaintext: the decrypted text, or None when it did not authenticate
+        self.is_token = is_token
+        self.plaintext = plaintext
+
+    @property
+    def is_encrypted(self):
+        """True when the text is a token that decrypted with our key"""
+        return self.plaintext is not None
+
+    def __repr__(self):
+        return f"DecryptResult(is_token={self.is_token}, decrypted={self.is_encrypted})"
+
+
+NOT_A_TOKEN = DecryptResult(False)
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Encryption:
-    def __init__(self):
-        self.key_manager = KeyManager()
-        self.fernet = None
-        self.initialize_fernet()
+    def __init__(self, encoding="base64", engine=AESGCMEngine.name,
+                 chunk_size=DEFAULT_CHUNK_SIZE, chunk_threshold=CHUNK_THRESHOLD,
+                 compression="zlib", key_manager=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown token encoding: {encoding}")
+        if engine not in WRITE_ENGINES:
+            raise ValueError(f"Unknown cipher engine: {engine}")
+        if compression not in CODECS:
+            raise ValueError(f"Unknown compression codec: {compression}")
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes")
+        self.encoding = encoding
+        self.engine_name = engine
+        self.chunk_size = chunk_size
+        self.chunk_threshold = chunk_threshold
+        # Compression makes token length depend on content; "none" disables it
+        self.compression = compression
+        self.key_manager = key_manager or get_key_manager()
+        self.state = KeyState()
+        self.initialize_engines()
+        # Rotations (ours or another process's) rebuild the engines immediately
+        self.key_manager.subscribe(self._on_key_changed)
         logging.info("Encryption module initialized")
 
-    def initialize_fernet(self):
-        """Initialize Fernet with the stored key"""
-        key = self.key_manager.get_encryption_key()
+    def initialize_engines(self, key=None):
+        """Build all cipher engines from the given or stored key"""
+        key = key or self.key_manager.get_encryption_key()
+        # Built completely, then published with a single assignment
+        self.state = KeyState(key)
         if key:
-            self.fernet = Fernet(key)
-            logging.info("Fernet initialized with stored key")
+            logging.info("Cipher engines initialized with stored key")
         else:
             logging.warning("No encryption key found")
+        return self.state
 
-    def encrypt(self, text):
-        """Encrypt the given text"""
-        try:
-            if not self.fernet:
-                logging.info("Reinitializing Fernet for encryption")
-                self.initialize_fernet()
+    @staticmethod
+    def _build_engines(key):
+        return {engine_id: engine(key) for engine_id, engine in ENGINES.items()}
+
+    @property
+    def engines(self):
+        return self.state.engines
+
+    @property
+    def fernet(self):
+        return self.state.fernet
+
+    @property
+    def active_key_id(self):
+        return self.state.key_id
+
+    def _current_state(self):
+        """The key state for one operation, loading the key if there is none yet"""
+        self.key_manager.check_for_changes()
+        state = self.state
+        if not state.engines:
+            logging.info("Reinitializing cipher engines")
+            state = self.initialize_engines()
+        return state
+
+    def _engines_for_key_id(self, key_id, state=None):
+        return (state or self.state).engines_for_key_id(key_id, self.key_manager)
 
-            if not isinstance(text, bytes):
-                text = text.encode()
+    def _on_key_changed(self, key):
+        """KeyManager subscriber: switch to the new key"""
+        self.initialize_engines(key)
 
-            encrypted = self.fernet.encrypt(text)
-            result = base64.urlsafe_b64encode(encrypted).decode()
-            logging.info("Text encrypted successfully")
+    def encrypt(self, text, encoding=None, engine=None, compression=None):
+        """Encrypt the given text into a token.
+
+        encoding, engine and compression default to the ones this instance
+        was created with; the "legacy" encoding always uses Fernet.
+        """
+        started = time.perf_counter()
+        try:
+            state = self._current_state()
+            data = text if isinstance(text, (bytes, bytearray, memoryview)) else text.encode()
+            size = len(data)
+
+            encoding = encoding or self.encoding
+            if encoding == "legacy":
+                result = base64.urlsafe_b64encode(state.fernet.encrypt(data)).decode()
+            else:
+                blob = self.encrypt_blob(data, engine, compression, state)
+                # Free the encoded plaintext before the token text is built
+                del data
+                result = encode_token(blob, encoding)
+            CRYPTO_SECONDS.labels("encrypt", size_class(size)).observe(time.perf_counter() - started)
+            CRYPTO_BYTES.labels("encrypt").inc(size)
+            logging.debug("Text encrypted successfully")
             return result
         except Exception as e:
             logging.error(f"Encryption error: {e}")
+            ERRORS.labels("encryption").inc()
             return None
 
     def decrypt(self, encrypted_text):
         """Decrypt the given text"""
-        try:
-            if not self.fernet:
-                logging.info("Reinitializing Fernet for decryption")
-                self.initialize_fernet()
-
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_text)
-            decrypted = self.fernet.decrypt(encrypted_bytes)
-            result = decrypted.decode()
-            logging.info("Text decrypted successfully")
-            return result
-        except Exception as e:
-            logging.error(f"Decryption error: {e}")
-            return None
+        result = self.classify(encrypted_text)
+        if result.is_encrypted:
+            logging.debug("Text decrypted successfully")
+            return result.plaintext
+        logging.error("Decryption error: text is not a valid token for the current key")
+        return None
 
     def is_encrypted(self, text):
         """Check if the text is encrypted"""
+        return self.classify(text).is_encrypted
+
+    @staticmethod
+    def looks_like_token(text):
+        """Cheap structural check that rejects plain text without decoding it"""
+        return token_format(text) is not None
+
+    def classify(self, text):
+        """Classify text and decrypt it in a single pass.
+
+        Returns a DecryptResult; callers should use its plaintext rather than
+        calling decrypt() again. Both compact and legacy tokens are accepted.
+        """
+        encoding = token_format(text)
+        if encoding is None:
+            return NOT_A_TOKEN
+
+        started = time.perf_counter()
         try:
-            encrypted_bytes = base64.urlsafe_b64decode(text)
-            self.fernet.decrypt(encrypted_bytes)
-            return True
-        except:
-            return False
\ No newline at end of file
+            state = self._current_state()
+            if encoding == "legacy":
+                decrypted = state.fernet.decrypt(base64.urlsafe_b64decode(text))
+            else:
+                blob = decode_token(text, encoding)
+                decrypted = self.decrypt_blob(blob, state)
+                del blob
+            CRYPTO_SECONDS.labels("decrypt", size_class(len(decrypted))).observe(
+                time.perf_counter() - started)
+            CRYPTO_BYTES.labels("decrypt").inc(len(decrypted))
+            return DecryptResult(True, decrypted.decode())
+        except Exception as e:
+            logging.debug(f"Token failed to decrypt: {e}")
+            ERRORS.labels("decryption").inc()
+            return DecryptResult(True)
+
+    def encrypt_blob(self, data, engine=None, compression=None, state=None):
+        """Encrypt bytes with the active key into a binary compact token.
+
+        Compressible payloads are compressed first, and payloads still above
+        the chunk threshold are split into segments.
+        """
+        state = state or self.state
+        key_id = state.key_id
+        cipher = state.engines[ENGINE_NAMES[engine or self.engine_name].engine_id]
+        codec, data = compress(data, compression or self.compression)
+        flags = codec << FLAG_CODEC_SHIFT | FLAG_KEY_ID
+        if len(data) < self.chunk_threshold:
+            header = HEADER.pack(FORMAT_VERSION, cipher.engine_id, flags) + key_id
+            return header + cipher.encrypt(data, header)
+
+        chunk_size = self.chunk_size
+        prefix = (HEADER.pack(FORMAT_VERSION, cipher.engine_id, flags | FLAG_CHUNKED) + key_id
+                  + CHUNK_HEADER.pack(chunk_size, os.urandom(16)))
+        view = memoryview(data)
+        count = -(-len(view) // chunk_size)
+
+        def seal(index):
+            segment = view[index * chunk_size:(index + 1) * chunk_size]
+            return cipher.encrypt(segment, prefix + SEGMENT_AAD.pack(index, index == count - 1))
+
+        if not isinstance(cipher, AEADEngine):
+            raise ValueError(f"Engine {cipher.name} cannot write chunked tokens")
+        # Sized up front: growing a huge bytearray reallocates and copies it
+        blob = bytearray(len(prefix) + len(view) + count * (AEAD_NONCE_SIZE + AEAD_TAG_SIZE))
+        blob[:len(prefix)] = prefix
+        offset = len(prefix)
+        for sealed in segment_executor().map(seal, range(count)):
+            blob[offset:offset + len(sealed)] = sealed
+            offset += len(sealed)
+        return blob
+
+    def decrypt_blob(self, blob, state=None):
+        """Decrypt a binary compact token, dispatching on its engine byte"""
+        version, engine_id, flags = HEADER.unpack_from(blob)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported token version {version}")
+        if flags & ~KNOWN_FLAGS:
+            raise ValueError(f"Unsupported token flags {flags:#x}")
+        state = state or self.state
+        header_size = HEADER.size
+        engines = state.engines
+        if flags & FLAG_KEY_ID:
+            header_size += KEY_ID_SIZE
+            engines = self._engines_for_key_id(bytes(blob[HEADER.size:header_size]), state)
+            if engines is None:
+                raise ValueError("Token was encrypted with an unknown or expired key")
+        cipher = engines.get(engine_id)
+        if cipher is None:
+            raise ValueError(f"Unsupported cipher engine {engine_id}")
+        if flags & FLAG_CHUNKED:
+            data = self._decrypt_chunked(blob, cipher, header_size)
+        else:
+            header = bytes(blob[:header_size])
+            data = cipher.decrypt(memoryview(blob)[header_size:], header)
+        return decompress(data, (flags & FLAG_CODEC_MASK) >> FLAG_CODEC_SHIFT)
+
+    def _decrypt_chunked(self, blob, cipher, header_size):
+        """Decrypt the segments of a chunked token in parallel"""
+        if not isinstance(cipher, AEADEngine):
+            raise ValueError(f"Engine {cipher.name} cannot read chunked tokens")
+        chunk_size, _ = CHUNK_HEADER.unpack_from(blob, header_size)
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Invalid chunk size {chunk_size}")
+
+        view = memoryview(blob)
+        prefix_size = header_size + CHUNK_HEADER.size
+        prefix = bytes(view[:prefix_size])
+        body = view[prefix_size:]
+        sealed_size = chunk_size + AEAD_NONCE_SIZE + AEAD_TAG_SIZE
+        count = max(1, -(-len(body) // sealed_size))
+
+        def open_segment(index):
+            segment = body[index * sealed_size:(index + 1) * sealed_size]
+            return cipher.decrypt(segment, prefix + SEGMENT_AAD.pack(index, index == count - 1))
+
+        plaintext = bytearray(max(0, len(body) - count * (AEAD_NONCE_SIZE + AEAD_TAG_SIZE)))
+        offset = 0
+        for segment in segment_executor().map(open_segment, range(count)):
+            plaintext[offset:offset + len(segment)] = segment
+            offset += len(segment)
+        return plaintext
+
+    def encrypt_stream(self, read, write, encoding=None, engine=None, compression=None,
+                       sample=None):
+        """Encrypt a byte stream into token text, in constant memory.
+
+        read(size) returns input bytes and write(data) receives the token
+        text. Inputs below the chunk threshold become ordinary tokens;
+        larger ones are compressed, sealed and encoded one chunk at a time
+        into a chunked token. sample, when given (e.g. a whole memory
+        mapped file), is what decides whether compression is worthwhile.
+        """
+        state = self._current_state()
+        if not state.engines:
+            raise ValueError("No encryption key available")
+        writer = TokenTextWriter(write, encoding or self.encoding)
+
+        head = read_exactly(read, self.chunk_threshold)
+        if len(head) < self.chunk_threshold:
+            writer.feed(self.encrypt_blob(head, engine, compression, state))
+            writer.close()
+            return
+
+        key_id = state.key_id
+        cipher = state.engines[ENGINE_NAMES[engine or self.engine_name].engine_id]
+        if not isinstance(cipher, AEADEngine):
+            raise ValueError(f"Engine {cipher.name} cannot write chunked tokens")
+        codec = CODECS[compression or self.compression]
+        if codec != CODEC_NONE and not is_compressible(head if sample is None else sample):
+            codec = CODEC_NONE
+        codec_compressor = compressor(codec) if codec != CODEC_NONE else None
+        flags = codec << FLAG_CODEC_SHIFT | FLAG_KEY_ID | FLAG_CHUNKED
+        chunk_size = self.chunk_size
+        prefix = (HEADER.pack(FORMAT_VERSION, cipher.engine_id, flags) + key_id
+                  + CHUNK_HEADER.pack(chunk_size, os.urandom(16)))
+        writer.feed(prefix)
+
+        # Segments are sealed on the shared pool, a bounded number in flight
+        executor = segment_executor()
+        in_flight = deque()
+        max_in_flight = 2 * SEGMENT_WORKERS
+        pending = bytearray()
+        index = 0
+
+        def submit(segment, final):
+            nonlocal index
+            in_flight.append(executor.submit(
+                cipher.encrypt, segment, prefix + SEGMENT_AAD.pack(index, final)))
+            index += 1
+            while len(in_flight) > (0 if final else max_in_flight):
+                writer.feed(in_flight.popleft().result())
+
+        data = head
+        while data:
+            pending += codec_compressor.compress(data) if codec_compressor else data
+            # A full chunk is only known not to be the last once more follows it
+            while len(pending) > chunk_size:
+                submit(bytes(pending[:chunk_size]), False)
+                del pending[:chunk_size]
+            data = read(CODEC_CHUNK)
+        if codec_compressor:
+            pending += codec_compressor.flush()
+        while len(pending) > chunk_size:
+            submit(bytes(pending[:chunk_size]), False)
+            del pending[:chunk_size]
+        submit(bytes(pending), True)
+        writer.close()
+        logging.info(f"Stream encrypted into {index} segments")
+
+    def decrypt_stream(self, read, write):
+        """Decrypt token text from read(size), passing plaintext to write(data).
+
+        Chunked tokens are opened a segment at a time, so memory stays
+        constant; other tokens are small and are decrypted in one piece.
+        """
+        state = self._current_state()
+        reader = TokenTextReader(read)
+        if reader.encoding is None:
+            text = reader.read_all_text()
+            if token_format(text) != "legacy":
+                raise ValueError("Input is not a Secure Clipboard token")
+            write(state.fernet.decrypt(base64.urlsafe_b64decode(text)))
+            return
+
+        header = reader.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("Token is truncated")
+        version, engine_id, flags = HEADER.unpack(header)
+        if flags & FLAG_KEY_ID:
+            header += reader.read(KEY_ID_SIZE)
+        if not flags & FLAG_CHUNKED or version != FORMAT_VERSION:
+            # decrypt_blob validates the header and reports anything unsupported
+            rest = bytearray(header)
+            while True:
+                data = reader.read(CODEC_CHUNK)
+                if not data:
+                    break
+                rest += data
+            write(self.decrypt_blob(rest, state))
+            return
+
+        engines = self._engines_for_key_id(bytes(header[HEADER.size:]), state) \
+            if flags & FLAG_KEY_ID else state.engines
+        if engines is None:
+            raise ValueError("Token was encrypted with an unknown or expired key")
+        if flags & ~KNOWN_FLAGS:
+            raise ValueError(f"Unsupported token flags {flags:#x}")
+        cipher = engines.get(engine_id)
+        if not isinstance(cipher, AEADEngine):
+            raise ValueError(f"Unsupported cipher engine {engine_id} for chunked tokens")
+        chunk_header = reader.read(CHUNK_HEADER.size)
+        if len(chunk_header) < CHUNK_HEADER.size:
+            raise ValueError("Token is truncated")
+        chunk_size, _ = CHUNK_HEADER.unpack(chunk_header)
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Invalid chunk size {chunk_size}")
+        prefix = bytes(header) + chunk_header
+        codec = (flags & FLAG_CODEC_MASK) >> FLAG_CODEC_SHIFT
+        codec_decompressor = decompressor(codec) if codec != CODEC_NONE else None
+        sealed_size = chunk_size + AEAD_NONCE_SIZE + AEAD_TAG_SIZE
+
+        index = 0
+        segment = reader.read(sealed_size)
+        while True:
+            # Read one segment ahead to know whether this one is the last
+            following = reader.read(sealed_size) if len(segment) == sealed_size else b''
+            final = not following
+            try:
+                plaintext = cipher.decrypt(segment, prefix + SEGMENT_AAD.pack(index, final))
+            except InvalidTag:
+                raise ValueError(f"Segment {index} failed authentication (corrupt or truncated token)")
+            if codec_decompressor:
+                for piece in iter_decompress(codec_decompressor, plaintext):
+                    write(piece)
+            else:
+                write(plaintext)
+            if final:
+                break
+            segment = following
+            index += 1
+        if codec_decompressor and not codec_decompressor.eof:
+            raise ValueError("Compressed payload is incomplete")
+        logging.info(f"Stream decrypted from {index + 1} segments")
@@ -0,0 +1,465 @@
+"""Encrypted clipboard history: an append-only log split into segments.
+
+Each segment is a pair of files named after the sequence number of its
+first entry:
+
+    <first seq>.log  encrypted entries back to back (binary compact tokens)
+    <first seq>.idx  one fixed-size INDEX_ENTRY per entry, memory-mapped
+
+Index entries hold the metadata (time, kind, length) needed to list
+history, so listing never decrypts anything. The active segment's index is
+preallocated and entries are written straight into the mapping, making an
+append one log write plus one struct.pack_into. Full segments are sealed
+(index trimmed, mapped read-only) and retention deletes whole segments.
+Decrypted entries are kept in a small LRU.
+"""
+import bisect
+import collections
+import logging
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+# seq, log offset, log length, timestamp, characters, kind
+INDEX_ENTRY = struct.Struct('>QIIdIB3x')
+SEGMENT_ENTRIES = 4096
+SEGMENT_SIZE = 16 * 1024 * 1024
+# Larger clipboard contents are not kept in history
+MAX_ITEM_SIZE = 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50000
+CACHE_ENTRIES = 128
+CACHE_CHARS = 8 * 1024 * 1024
+RETENTION_INTERVAL = 600.0
+SEARCH_MAX_SCAN = 2000
+
+KIND_ENCRYPTED = 1
+KIND_DECRYPTED = 2
+KIND_NAMES = {KIND_ENCRYPTED: "encrypted", KIND_DECRYPTED: "decrypted"}
+
+HistoryEntry = collections.namedtuple("HistoryEntry", "seq timestamp kind chars")
+
+
+def default_history_dir():
+    if sys.platform == 'win32' and os.environ.get("LOCALAPPDATA"):
+        base = os.environ["LOCALAPPDATA"]
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "SecureClipboard", "history")
+
+
+class Segment:
+    """One .log/.idx pair; mapped on first use"""
+
+    def __init__(self, directory, first_seq):
+        self.first_seq = first_seq
+        base = os.path.join(directory, f"{first_seq:016d}")
+        self.log_path = base + ".log"
+        self.idx_path = base + ".idx"
+        self.count = 0
+        self.log_size = 0
+        self.writable = False
+        self._map = None
+        self._log = None
+        self._reader = None
+
+    @classmethod
+    def create(cls, directory, first_seq):
+        segment = cls(directory, first_seq)
+        with open(segment.idx_path, "wb") as f:
+            f.truncate(SEGMENT_ENTRIES * INDEX_ENTRY.size)
+        open(segment.log_path, "ab").close()
+        segment.open(writable=True)
+        return segment
+
+    def open(self, writable=False):
+        """Map the index; a writable segment also recovers from a crash mid-append"""
+        if self._map is not None:
+            return
+        self.writable = writable
+        mode = "r+b" if writable else "rb"
+        with open(self.idx_path, mode) as f:
+            size = os.fstat(f.fileno()).st_size
+            if writable and size < SEGMENT_ENTRIES * INDEX_ENTRY.size:
+                f.truncate(SEGMENT_ENTRIES * INDEX_ENTRY.size)
+                size = SEGMENT_ENTRIES * INDEX_ENTRY.size
+            if size:
+                access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+                self._map = mmap.mmap(f.fileno(), size, access=access)
+        self.count = self._count_entries(size // INDEX_ENTRY.size)
+        if self.count:
+            _, offset, length, _, _, _ = self.entry(self.count - 1)
+            self.log_size = offset + length
+        if writable:
+            # Drop bytes written after the last indexed entry (a torn append)
+            self._log = open(self.log_path, "ab")
+            if os.fstat(self._log.fileno()).st_size > self.log_size:
+                self._log.truncate(self.log_size)
+
+    def _count_entries(self, slots):
+        """Entries are filled in order, so the first empty slot is found by bisection"""
+        low, high = 0, slots
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(self._map, middle * INDEX_ENTRY.size)[0]:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entry(self, position):
+        return INDEX_ENTRY.unpack_from(self._map, position * INDEX_ENTRY.size)
+
+    @property
+    def full(self):
+        return self.count >= SEGMENT_ENTRIES or self.log_size >= SEGMENT_SIZE
+
+    def append(self, blob, timestamp, chars, kind):
+        seq = self.first_seq + self.count
+        self._log.write(blob)
+        self._log.flush()
+        INDEX_ENTRY.pack_into(self._map, self.count * INDEX_ENTRY.size,
+                              seq, self.log_size, len(blob), timestamp, chars, kind)
+        self.count += 1
+        self.log_size += len(blob)
+        return seq
+
+    def read(self, offset, length):
+        if self._reader is None:
+            self._reader = open(self.log_path, "rb")
+        self._reader.seek(offset)
+        return self._reader.read(length)
+
+    def seal(self):
+        """Trim the index to its entries and reopen it read-only"""
+        self.close()
+        with open(self.idx_path, "r+b") as f:
+            f.truncate(self.count * INDEX_ENTRY.size)
+        self.open()
+
+    def close(self):
+        for handle in (self._map, self._log, self._reader):
+            if handle is not None:
+                handle.close()
+        self._map = self._log = self._reader = None
+
+    def delete(self):
+        self.close()
+        for path in (self.log_path, self.idx_path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+class HistoryStore:
+    def __init__(self, directory=None, encryption=None, max_age=DEFAULT_MAX_AGE,
+                 max_entries=DEFAULT_MAX_ENTRIES, max_item_size=MAX_ITEM_SIZE, timers=None,
+                 read_only=False):
+        self.directory = directory or default_history_dir()
+        # Read-only stores (e.g. the CLI next to a running app) never write or truncate
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if encryption is None:
+            from encryption import Encryption
+            encryption = Encryption()
+        self.encryption = encryption
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_item_size = max_item_size
+        self._lock = threading.RLock()
+        # seq -> plaintext, least recently used first
+        self._cache = collections.OrderedDict()
+        self._cache_chars = 0
+        self._queue = None
+        self._writer = None
+
+        # Only the newest segment is opened now; older ones map on first read
+        first_seqs = self._list_segments()
+        self._segments = [Segment(self.directory, first_seq) for first_seq in first_seqs]
+        self._first_seqs = first_seqs
+        self._retention_timer = None
+        self.timers = timers
+        # Entries across all segments, kept up to date by writable stores
+        self._total = 0
+        if read_only:
+            logging.info(f"History store opened read-only with {len(self._segments)} segment(s)")
+            return
+        if self._segments:
+            active = self._segments[-1]
+            active.open(writable=True)
+            self._total = len(self)
+            if active.full:
+                self._roll()
+        else:
+            self._add_segment(1)
+
+        if self.timers is None:
+            from timer_service import get_timer_service
+            self.timers = get_timer_service()
+        self._retention_timer = self.timers.schedule(RETENTION_INTERVAL, self._retention_tick)
+        logging.info(f"History store opened with {len(self._segments)} segment(s)")
+
+    def _list_segments(self):
+        """First sequence numbers of the segments on disk; a missing directory is empty"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-4]) for name in names
+                      if name.endswith(".idx") and name[:-4].isdigit())
+
+    def _refresh(self):
+        """Read-only stores pick up what the writing process did since the last query.
+
+        The segment list is re-read (rolls and retention), and the newest
+        segment is remapped so its entry count is found again. A segment
+        that was newest last time may since have been sealed and trimmed,
+        so it is remapped as well (lock held).
+        """
+        if not self.read_only:
+            return
+        previous_newest = self._segments[-1] if self._segments else None
+        first_seqs = self._list_segments()
+        if first_seqs != self._first_seqs:
+            existing = {segment.first_seq: segment for segment in self._segments}
+            for first_seq, segment in existing.items():
+                if first_seq not in first_seqs:
+                    segment.close()
+            self._segments = [existing.get(first_seq) or Segment(self.directory, first_seq)
+                              for first_seq in first_seqs]
+            self._first_seqs = first_seqs
+        if previous_newest is not None:
+            previous_newest.close()
+        if self._segments:
+            self._segments[-1].close()
+
+    @property
+    def _active(self):
+        return self._segments[-1]
+
+    def _open(self, segment):
+        segment.open(writable=not self.read_only and segment is self._active)
+
+    def _add_segment(self, first_seq):
+        self._segments.append(Segment.create(self.directory, first_seq))
+        self._first_seqs.append(first_seq)
+
+    def _roll(self, enforce=True):
+        active = self._active
+        next_seq = active.first_seq + active.count
+        active.seal()
+        self._add_segment(next_seq)
+        if enforce:
+            self.enforce_retention()
+
+    def _segment_for(self, seq):
+        index = bisect.bisect_right(self._first_seqs, seq) - 1
+        if index < 0:
+            return None
+        segment = self._segments[index]
+        self._open(segment)
+        if seq - segment.first_seq >= segment.count:
+            return None
+        return segment
+
+    def append(self, text, kind):
+        """Encrypt and store text; returns its sequence number, or None if skipped"""
+        if self.read_only:
+            raise RuntimeError("History store is read-only")
+        if not text or len(text) > self.max_item_size:
+            return None
+        self.encryption.key_manager.check_for_changes()
+        blob = self.encryption.encrypt_blob(text.encode('utf-8', 'surrogatepass'))
+        with self._lock:
+            if self._active.full:
+                self._roll()
+            seq = self._active.append(blob, time.time(), len(text), kind)
+            self._total += 1
+            self._remember(seq, text)
+            if self._over_capacity():
+                self.enforce_retention()
+            return seq
+
+    def add(self, text, kind):
+        """Queue text for a background append so callers never wait on disk"""
+        if not text or len(text) > self.max_item_size:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._queue = queue.SimpleQueue()
+                self._writer = threading.Thread(target=self._write_queued, name="history-writer",
+                                                daemon=True)
+                self._writer.start()
+        self._queue.put((text, kind))
+
+    def _write_queued(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self.append(*item)
+            except Exception as e:
+                logging.error(f"Error writing clipboard history: {e}")
+
+    def recent(self, limit=50):
+        """Newest entries first, from the index alone; cost depends only on limit"""
+        entries = []
+        with self._lock:
+            self._refresh()
+            for segment in reversed(self._segments):
+                self._open(segment)
+                for position in range(segment.count - 1, -1, -1):
+                    seq, _, _, timestamp, chars, kind = segment.entry(position)
+                    entries.append(HistoryEntry(seq, timestamp, KIND_NAMES.get(kind, "unknown"), chars))
+                    if len(entries) >= limit:
+                        return entries
+        return entries
+
+    def get(self, seq, refresh=True):
+        """Decrypted text of one entry, or None if it is gone or undecryptable"""
+        with self._lock:
+            text = self._cache.get(seq)
+            if text is not None:
+                self._cache.move_to_end(seq)
+                return text
+            if refresh:
+                self._refresh()
+            segment = self._segment_for(seq)
+            if segment is None:
+                return None
+            _, offset, length, _, _, _ = segment.entry(seq - segment.first_seq)
+            blob = segment.read(offset, length)
+        try:
+            text = self.encryption.decrypt_blob(blob).decode('utf-8', 'surrogatepass')
+        except Exception as e:
+            logging.error(f"Error decrypting history entry {seq}: {e}")
+            return None
+        with self._lock:
+            self._remember(seq, text)
+        return text
+
+    def search(self, query, limit=20, max_scan=SEARCH_MAX_SCAN):
+        """Newest entries containing query (case-insensitive), scanning at most max_scan"""
+        query = query.lower()
+        matches = []
+        for entry in self.recent(max_scan):
+            # recent() has just refreshed a read-only view
+            text = self.get(entry.seq, refresh=False)
+            if text is not None and query in text.lower():
+                matches.append((entry, text))
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def _remember(self, seq, text):
+        """LRU bounded by entry count and total characters (lock held)"""
+        if len(text) > CACHE_CHARS:
+            return
+        previous = self._cache.pop(seq, None)
+        if previous is not None:
+            self._cache_chars -= len(previous)
+        self._cache[seq] = text
+        self._cache_chars += len(text)
+        while len(self._cache) > CACHE_ENTRIES or self._cache_chars > CACHE_CHARS:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_chars -= len(evicted)
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            total = 0
+            for segment in self._segments:
+                if segment is self._active or segment._map is not None:
+                    self._open(segment)
+                    total += segment.count
+                else:
+                    # Sealed indexes are trimmed, so their size gives the count
+                    total += os.path.getsize(segment.idx_path) // INDEX_ENTRY.size
+            return total
+
+    def _over_capacity(self):
+        """True when the oldest segment can go and still leave max_entries (lock held)"""
+        if len(self._segments) < 2:
+            return False
+        oldest = self._segments[0]
+        self._open(oldest)
+        return self._total - oldest.count >= self.max_entries
+
+    def enforce_retention(self):
+        """Delete whole sealed segments past max_age or beyond max_entries.
+
+        Only whole segments go, so up to one segment more than max_entries
+        may be kept. The entry limit is checked on every append; age is
+        checked when a segment rolls and every RETENTION_INTERVAL.
+        """
+        if self.read_only:
+            return 0
+        cutoff = time.time() - self.max_age
+        dropped = 0
+        with self._lock:
+            active = self._active
+            if active.count and active.entry(active.count - 1)[3] < cutoff:
+                # Everything in the active segment expired; seal it so it can go too
+                self._roll(enforce=False)
+            while len(self._segments) > 1:
+                oldest = self._segments[0]
+                self._open(oldest)
+                newest_time = oldest.entry(oldest.count - 1)[3] if oldest.count else 0.0
+                if newest_time >= cutoff and not self._over_capacity():
+                    break
+                self._total -= oldest.count
+                oldest.delete()
+                del self._segments[0]
+                del self._first_seqs[0]
+                dropped += 1
+            if dropped:
+                self._drop_cached_before(self._first_seqs[0])
+        if dropped:
+            logging.info(f"History retention dropped {dropped} segment(s)")
+        return dropped
+
+    def _drop_cached_before(self, first_seq):
+        for seq in [seq for seq in self._cache if seq < first_seq]:
+            self._cache_chars -= len(self._cache.pop(seq))
+
+    def _retention_tick(self):
+        try:
+            self.enforce_retention()
+        except Exception as e:
+            logging.error(f"Error enforcing history retention: {e}")
+        self._retention_timer = self.timers.schedule(RETENTION_INTERVAL, self._retention_tick)
+
+    def clear(self):
+        """Delete all history; sequence numbers keep counting up"""
+        if self.read_only:
+            raise RuntimeError("History store is read-only")
+        with self._lock:
+            next_seq = self._active.first_seq + self._active.count
+            for segment in self._segments:
+                segment.delete()
+            self._segments = []
+            self._first_seqs = []
+            self._cache.clear()
+            self._cache_chars = 0
+            self._total = 0
+            self._add_segment(next_seq)
+        logging.info("Clipboard history cleared")
+
+    def close(self):
+        """Finish queued appends and release files"""
+        if self.timers is not None:
+            self.timers.cancel(self._retention_timer)
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
@@ -1,28 +1,170 @@
 import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
 from cryptography.fernet import Fernet
 from keyrings.alt.file import PlaintextKeyring
 import logging
+from metrics import ERRORS, KEY_EVENTS
+from timer_service import get_timer_service
+from utils import cached_derive_key
+
+# How often the keyring file is stat()ed for edits made by other processes
+KEY_CHECK_INTERVAL = 1.0
+# Retired keys stay available for decrypting old tokens until either limit hits
+MAX_RETIRED_KEYS = 10
+RETIRED_KEY_MAX_AGE = 90 * 24 * 3600
+KEY_ID_SIZE = 4
+
+
+def compute_key_id(key):
+    """Short identifier stored in token headers to select the key"""
+    return hashlib.sha256(b"SecureClipboard key id" + base64.urlsafe_b64decode(key)).digest()[:KEY_ID_SIZE]
+
+
+_shared_key_manager = None
+_shared_lock = threading.Lock()
+
+
+def get_key_manager():
+    """Return the process-wide KeyManager shared by all components"""
+    global _shared_key_manager
+    with _shared_lock:
+        if _shared_key_manager is None:
+            _shared_key_manager = KeyManager()
+        return _shared_key_manager
+
+
+def set_key_manager(key_manager):
+    """Replace the process-wide KeyManager (benchmarks use a throwaway keyring)"""
+    global _shared_key_manager
+    with _shared_lock:
+        _shared_key_manager = key_manager
+
 
 class KeyManager:
-    def __init__(self):
+    def __init__(self, check_interval=KEY_CHECK_INTERVAL, max_retired_keys=MAX_RETIRED_KEYS,
+                 retired_key_max_age=RETIRED_KEY_MAX_AGE, timers=None, keyring=None):
         self.SERVICE_NAME = "SecureClipboard"
         self.KEY_NAME = "encryption_key"
-        self.keyring = PlaintextKeyring()
+        self.RETIRED_KEYS_NAME = "retired_keys"
+        self.TEAM_SETTINGS_NAME = "team_settings"
+        self.keyring = keyring or PlaintextKeyring()
+        self.check_interval = check_interval
+        self.max_retired_keys = max_retired_keys
+        self.retired_key_max_age = retired_key_max_age
+        self._lock = threading.RLock()
+        # Active key: the team key when team mode is on, else the stored key
+        self._cached_key = None
+        self._stored_key = None
+        # Derived from the team passphrase; only ever held in memory
+        self._team_key = None
+        # [(key, retired_at)] newest first, and key id -> key for every usable key
+        self._retired_keys = []
+        self._keys_by_id = {}
+        self._cache_loaded = False
+        self._file_signature = None
+        self._next_check = 0.0
+        self._subscribers = []
+        # Fires when the oldest retired key ages out; started lazily
+        self._timers = timers
+        self._retention_timer = None
         logging.info("Initialized KeyManager with PlaintextKeyring backend")
 
-    def generate_new_key(self):
-        """Generate and store a new encryption key"""
+    def subscribe(self, callback):
+        """Call callback(key) whenever the encryption key changes.
+
+        Bound methods are held weakly so subscribers can be garbage collected.
+        """
+        with self._lock:
+            if hasattr(callback, '__self__'):
+                self._subscribers.append(weakref.WeakMethod(callback))
+            else:
+                self._subscribers.append(lambda: callback)
+
+    def unsubscribe(self, callback):
+        """Stop notifying callback about key changes"""
+        with self._lock:
+            self._subscribers = [ref for ref in self._subscribers
+                                 if ref() is not None and ref() != callback]
+
+    def _notify(self, key):
+        with self._lock:
+            self._subscribers = [ref for ref in self._subscribers if ref() is not None]
+            callbacks = [ref() for ref in self._subscribers]
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback(key)
+            except Exception as e:
+                logging.error(f"Error notifying key change subscriber: {e}")
+
+    def _read_file_signature(self):
+        """Cheap fingerprint of the keyring file used to spot external edits"""
         try:
-            key = Fernet.generate_key()
-            self.keyring.set_password(self.SERVICE_NAME, self.KEY_NAME, key.decode())
-            logging.info("Successfully generated and stored new encryption key")
-            return key
-        except Exception as e:
-            logging.error(f"Error generating new key: {e}")
+            stat = os.stat(self.keyring.file_path)
+            return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except OSError:
             return None
 
-    def get_encryption_key(self):
-        """Retrieve the stored encryption key"""
+    def _store_cached_key(self, key, retired_keys):
+        """Update the cache; returns True when the usable keys changed"""
+        keys_by_id = {compute_key_id(old_key): old_key for old_key, _ in retired_keys}
+        for usable_key in (key, self._team_key):
+            if usable_key:
+                keys_by_id[compute_key_id(usable_key)] = usable_key
+        active_key = self._team_key or key
+        changed = (not self._cache_loaded or active_key != self._cached_key
+                   or keys_by_id.keys() != self._keys_by_id.keys())
+        self._cached_key = active_key
+        self._stored_key = key
+        self._retired_keys = retired_keys
+        self._keys_by_id = keys_by_id
+        self._cache_loaded = True
+        self._file_signature = self._read_file_signature()
+        self._next_check = time.monotonic() + self.check_interval
+        self._schedule_retention()
+        return changed
+
+    def _schedule_retention(self):
+        """Arm one timer for the next retired key expiry instead of polling"""
+        if not self._retired_keys:
+            if self._retention_timer is not None:
+                self._retention_timer.cancel()
+                self._retention_timer = None
+            return
+        if self._timers is None:
+            self._timers = get_timer_service()
+        oldest = min(retired_at for _, retired_at in self._retired_keys)
+        delay = max(0.0, oldest + self.retired_key_max_age - time.time()) + 1.0
+        self._retention_timer = self._timers.reschedule(
+            self._retention_timer, delay, self.prune_retired_keys)
+
+    def check_for_changes(self):
+        """Reload the key if the keyring file was modified by another process"""
+        if self._cache_loaded and time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            signature = self._read_file_signature()
+            if self._cache_loaded and signature == self._file_signature:
+                self._next_check = time.monotonic() + self.check_interval
+                return
+            was_loaded = self._cache_loaded
+            key = self._load_key()
+            retired_keys, pruned = self._prune(self._load_retired_keys())
+            if pruned:
+                self._save_retired_keys(retired_keys)
+            changed = self._store_cached_key(key, retired_keys)
+        if changed and was_loaded:
+            logging.info("Encryption key changed on disk, reloading")
+            KEY_EVENTS.labels("reloaded").inc()
+            self._notify(self._cached_key)
+
+    def _load_key(self):
         try:
             key = self.keyring.get_password(self.SERVICE_NAME, self.KEY_NAME)
             if key:
@@ -32,14 +174,146 @@ class KeyManager:
             return None
         except Exception as e:
             logging.error(f"Error retrieving key: {e}")
+            ERRORS.labels("key_manager").inc()
+            return None
+
+    def _load_retired_keys(self):
+        try:
+            stored = self.keyring.get_password(self.SERVICE_NAME, self.RETIRED_KEYS_NAME)
+            if not stored:
+                return []
+            return [(entry["key"].encode(), entry["retired_at"]) for entry in json.loads(stored)]
+        except Exception as e:
+            logging.error(f"Error reading retired keys: {e}")
+            ERRORS.labels("key_manager").inc()
+            return []
+
+    def _save_retired_keys(self, retired_keys):
+        stored = json.dumps([{"key": key.decode(), "retired_at": retired_at}
+                             for key, retired_at in retired_keys])
+        self.keyring.set_password(self.SERVICE_NAME, self.RETIRED_KEYS_NAME, stored)
+
+    def _prune(self, retired_keys):
+        """Apply the retention policy; returns (kept keys, whether any were dropped)"""
+        cutoff = time.time() - self.retired_key_max_age
+        kept = [(key, retired_at) for key, retired_at in retired_keys if retired_at >= cutoff]
+        kept = kept[:self.max_retired_keys]
+        return kept, len(kept) != len(retired_keys)
+
+    def prune_retired_keys(self):
+        """Drop retired keys that fall outside the retention policy"""
+        self.check_for_changes()
+        with self._lock:
+            kept, pruned = self._prune(self._retired_keys)
+            if not pruned:
+                return 0
+            self._save_retired_keys(kept)
+            dropped = len(self._retired_keys) - len(kept)
+            self._store_cached_key(self._stored_key, kept)
+        logging.info(f"Aged out {dropped} retired encryption key(s)")
+        KEY_EVENTS.labels("pruned").inc(dropped)
+        self._notify(self._cached_key)
+        return dropped
+
+    def generate_new_key(self):
+        """Generate and store a new encryption key, retiring the current one"""
+        try:
+            self.check_for_changes()
+            key = Fernet.generate_key()
+            with self._lock:
+                retired_keys = list(self._retired_keys)
+                if self._stored_key:
+                    retired_keys.insert(0, (self._stored_key, time.time()))
+                retired_keys, _ = self._prune(retired_keys)
+                self._save_retired_keys(retired_keys)
+                self.keyring.set_password(self.SERVICE_NAME, self.KEY_NAME, key.decode())
+                self._store_cached_key(key, retired_keys)
+            logging.info("Successfully generated and stored new encryption key")
+            KEY_EVENTS.labels("generated").inc()
+            if self._team_key:
+                logging.info("Team key remains active until team mode is disabled")
+            self._notify(self._cached_key)
+            return key
+        except Exception as e:
+            logging.error(f"Error generating new key: {e}")
+            ERRORS.labels("key_manager").inc()
             return None
 
+    def get_encryption_key(self):
+        """Retrieve the encryption key, served from memory after the first read"""
+        self.check_for_changes()
+        return self._cached_key
+
+    def get_key_by_id(self, key_id):
+        """Return the active or retired key with this id, or None"""
+        self.check_for_changes()
+        return self._keys_by_id.get(key_id)
+
+    @property
+    def team_mode(self):
+        """True while a passphrase-derived team key is the active key"""
+        return self._team_key is not None
+
+    def enable_team_key(self, passphrase, salt, **kdf_params):
+        """Make a key derived from a shared team passphrase the active key.
+
+        Teammates using the same passphrase, salt and KDF parameters can
+        decrypt each other's tokens. The passphrase and derived key stay in
+        memory; the salt and parameters are saved for the next session.
+        Returns the team key id.
+        """
+        self.check_for_changes()
+        key = cached_derive_key(passphrase, salt, **kdf_params)
+        with self._lock:
+            self._team_key = key
+            self._save_team_settings(salt, kdf_params)
+            changed = self._store_cached_key(self._stored_key, self._retired_keys)
+        logging.info("Team passphrase key enabled")
+        if changed:
+            self._notify(self._cached_key)
+        return compute_key_id(key)
+
+    def disable_team_key(self):
+        """Switch back to this machine's stored key"""
+        with self._lock:
+            if self._team_key is None:
+                return
+            self._team_key = None
+            self._store_cached_key(self._stored_key, self._retired_keys)
+        logging.info("Team passphrase key disabled")
+        self._notify(self._cached_key)
+
+    def get_team_settings(self):
+        """Return (salt, kdf_params) saved by enable_team_key(), or None"""
+        try:
+            stored = self.keyring.get_password(self.SERVICE_NAME, self.TEAM_SETTINGS_NAME)
+            if not stored:
+                return None
+            settings = json.loads(stored)
+            return base64.urlsafe_b64decode(settings["salt"]), settings["kdf_params"]
+        except Exception as e:
+            logging.error(f"Error reading team settings: {e}")
+            return None
+
+    def _save_team_settings(self, salt, kdf_params):
+        stored = json.dumps({"salt": base64.urlsafe_b64encode(salt).decode(),
+                             "kdf_params": kdf_params})
+        self.keyring.set_password(self.SERVICE_NAME, self.TEAM_SETTINGS_NAME, stored)
+
+    def get_retired_keys(self):
+        """Return [(key, retired_at)] for retired keys, newest first"""
+        self.check_for_changes()
+        return list(self._retired_keys)
+
     def delete_key(self):
         """Delete the stored encryption key"""
         try:
-            self.keyring.delete_password(self.SERVICE_NAME, self.KEY_NAME)
+            with self._lock:
+                self.keyring.delete_password(self.SERVICE_NAME, self.KEY_NAME)
+                self._store_cached_key(None, self._retired_keys)
             logging.info("Successfully deleted encryption key")
+            self._notify(None)
             return True
         except Exception as e:
             logging.error(f"Error deleting key: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,248 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Records waiting for the writer thread; beyond this new records are dropped
+MAX_QUEUE_SIZE = 10000
+# Each call site may log this many warnings/errors per period, then is muted
+RATE_LIMIT_BURST = 5
+RATE_LIMIT_PERIOD = 60.0
+
+EVENT_LOGGER = logging.getLogger("secureclip.events")
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+class Event:
+    """Structured log message: an event name plus key=value fields.
+
+    The text is only built when a handler formats the record, which
+    happens on the writer thread rather than the caller's.
+    """
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __str__(self):
+        parts = [self.name]
+        for key, value in self.fields.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            elif isinstance(value, str) and (not value or ' ' in value):
+                value = repr(value)
+            parts.append(f"{key}={value}")
+        return " ".join(parts)
+
+
+def log_event(name, level=logging.INFO, **fields):
+    """Emit one structured event, e.g. log_event("clipboard.encrypted", chars=12)"""
+    if EVENT_LOGGER.isEnabledFor(level):
+        EVENT_LOGGER.log(level, Event(name, fields), extra={"event": name, "fields": fields},
+                         stacklevel=2)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let each call site (or structured event name) log at most `burst`
+    records per `period` seconds.
+
+    Records below `min_level` always pass. When a muted call site is allowed
+    through again its message notes how many records were suppressed.
+    """
+
+    def __init__(self, burst=RATE_LIMIT_BURST, period=RATE_LIMIT_PERIOD,
+                 min_level=logging.WARNING, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.min_level = min_level
+        self.clock = clock
+        self.suppressed = 0
+        # event name or (pathname, lineno) -> [window start, records passed, records suppressed]
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.min_level:
+            return True
+        # Events all pass through log_event(), so they are keyed by name
+        key = getattr(record, "event", None) or (record.pathname, record.lineno)
+        now = self.clock()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                return True
+            else:
+                window[2] += 1
+                self.suppressed += 1
+                return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fixed fraction of records per level, e.g. {logging.DEBUG: 0.1}.
+
+    Sampling is deterministic (every n-th record) so short runs still see
+    a representative share.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        with self._lock:
+            count = self._counts.get(record.levelno, 0) + 1
+            self._counts[record.levelno] = count
+        return int(count * rate) != int((count - 1) * rate)
+
+
+def parse_sampling(spec):
+    """Parse "debug=0.1,info=0.5" into {logging.DEBUG: 0.1, logging.INFO: 0.5}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        level = logging.getLevelName(name.strip().upper())
+        if not isinstance(level, int) or not rate:
+            raise ValueError(f"Invalid sampling entry {item!r}, expected LEVEL=RATE")
+        rates[level] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured events keep their fields"""
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname,
+                 "thread": record.threadName}
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+            entry.update(record.fields)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """Queue records for the writer thread without ever blocking the caller"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The queue never leaves this process, so formatting can wait for
+        # the writer thread instead of running on the caller's
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Root-logger setup: filters run inline, formatting and I/O on a thread"""
+
+    def __init__(self, level=logging.INFO, sampling=None, burst=RATE_LIMIT_BURST,
+                 period=RATE_LIMIT_PERIOD, json_format=False, stream=None,
+                 max_queue=MAX_QUEUE_SIZE):
+        self.pid = os.getpid()
+        self.level = level
+        sink = logging.StreamHandler(stream or sys.stderr)
+        sink.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+        self.rate_limit = RateLimitFilter(burst, period)
+        self.handler = BackgroundHandler(queue.Queue(max_queue))
+        self.handler.setLevel(level)
+        if sampling:
+            self.handler.addFilter(SamplingFilter(sampling))
+        self.handler.addFilter(self.rate_limit)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, sink)
+
+    def start(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        self.listener.start()
+
+    def stop(self):
+        """Flush queued records and detach from the root logger"""
+        logging.getLogger().removeHandler(self.handler)
+        # A forked child inherits the pipeline but not its writer thread
+        if os.getpid() == self.pid:
+            if self.handler.dropped:
+                self.listener.handle(logging.makeLogRecord({
+                    "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Dropped {self.handler.dropped} log records (queue full)"}))
+            self.listener.stop()
+
+    def stats(self):
+        return {"queued": self.handler.queue.qsize(), "dropped": self.handler.dropped,
+                "rate_limited": self.rate_limit.suppressed}
+
+
+def setup_logging(level=logging.INFO, sampling=None, burst=RATE_LIMIT_BURST,
+                  period=RATE_LIMIT_PERIOD, json_format=False, stream=None):
+    """Install the logging pipeline on the root logger, replacing any previous one"""
+    global _pipeline
+    with _pipeline_lock:
+        first = _pipeline is None
+        if _pipeline is not None:
+            _pipeline.stop()
+        _pipeline = LogPipeline(level, sampling, burst, period, json_format, stream)
+        _pipeline.start()
+        if first:
+            atexit.register(shutdown_logging)
+        return _pipeline
+
+
+def shutdown_logging():
+    """Flush and stop the pipeline; logging falls back to Python's default"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+            _pipeline = None
+
+
+def add_logging_arguments(parser):
+    """--log-level, --log-sample and --log-json for entry points"""
+    parser.add_argument("--log-level", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--log-sample", type=parse_sampling, metavar="LEVEL=RATE,...",
+                        help="keep only a fraction of records per level, e.g. debug=0.1,info=0.5")
+    parser.add_argument("--log-json", action="store_true", help="write logs as JSON lines")
+
+
+def setup_logging_from_args(args):
+    return setup_logging(getattr(logging, args.log_level), args.log_sample,
+                         json_format=args.log_json)
@@ -1,8 +1,10 @@
 import tkinter as tk
 from tkinter import ttk
 import logging
-from PIL import Image, ImageDraw
 import sys
+from metrics import live_summary
+from text_viewer import DecryptedTextViewer
+from ui_dispatcher import UIDispatcher, EVENT_DECRYPT_DISPLAY, EVENT_SHOW_WINDOW
 
 class MainWindow:
     def __init__(self, clipboard_monitor=None):
@@ -11,6 +13,11 @@ class MainWindow:
         self.clipboard_monitor = clipboard_monitor
         self.setup_window()
         self.create_widgets()
+        # All UI updates from background threads go through the dispatcher
+        self.dispatcher = UIDispatcher(self.root)
+        self.dispatcher.register(EVENT_DECRYPT_DISPLAY, self._render_decrypt_display, coalesce=True)
+        self.dispatcher.register(EVENT_SHOW_WINDOW, self._show_window, coalesce=True)
+        self.dispatcher.start()
         logging.info("Main window initialized")
         self.update_timer_id = None
         # Don't start updates until clipboard monitor is set
@@ -25,7 +32,7 @@ class MainWindow:
     def setup_window(self):
         # Set window size and position
         window_width = 400
-        window_height = 450  # Increased height for decryption display
+        window_height = 605  # Increased height for decryption viewer and metrics
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
         x_position = (screen_width - window_width) // 2
@@ -42,7 +49,6 @@ class MainWindow:
         style.configure("Header.TLabel", font=('Segoe UI', 16, 'bold'))
         style.configure("Active.TLabel", foreground='green', font=('Segoe UI', 9, 'bold'))
         style.configure("Inactive.TLabel", foreground='gray', font=('Segoe UI', 9))
-        style.configure("Decrypted.TLabel", font=('Segoe UI', 10), foreground='#1565C0')
 
     def create_widgets(self):
         # Header with status indicator
@@ -87,17 +93,12 @@ class MainWindow:
             command=self.update_mode
         ).pack(anchor=tk.W, pady=5)
 
-        # Live decryption display
-        decrypt_frame = ttk.LabelFrame(self.root, text="Live Decryption", padding="20")
+        # Live decryption display; only the visible lines are ever rendered
+        decrypt_frame = ttk.LabelFrame(self.root, text="Live Decryption", padding="20 10")
         decrypt_frame.pack(fill=tk.X, padx=20, pady=10)
 
-        self.decrypt_label = ttk.Label(
-            decrypt_frame,
-            text="Decrypted text will appear here",
-            style="Decrypted.TLabel",
-            wraplength=320
-        )
-        self.decrypt_label.pack(anchor=tk.W, pady=5)
+        self.decrypt_viewer = DecryptedTextViewer(decrypt_frame)
+        self.decrypt_viewer.pack(fill=tk.X)
 
         # Status with more detailed information
         status_frame = ttk.LabelFrame(self.root, text="Current Status", padding="20")
@@ -117,6 +118,15 @@ class MainWindow:
         )
         self.mode_label.pack(anchor=tk.W)
 
+        # Live counters and p95 stage latencies, refreshed with the status
+        self.metrics_label = ttk.Label(
+            status_frame,
+            text="",
+            style="Status.TLabel",
+            justify=tk.LEFT
+        )
+        self.metrics_label.pack(anchor=tk.W, pady=(5, 0))
+
         # Only show shortcuts frame on Windows
         if sys.platform == 'win32':
             shortcut_frame = ttk.LabelFrame(self.root, text="Additional Options", padding="20")
@@ -149,11 +159,11 @@ class MainWindow:
         ).pack(side=tk.RIGHT, padx=5)
 
     def update_decrypt_display(self, text):
-        """Update the live decryption display"""
-        if text:
-            self.decrypt_label.configure(text=text)
-        else:
-            self.decrypt_label.configure(text="Decrypted text will appear here")
+        """Update the live decryption display; safe to call from any thread"""
+        self.dispatcher.post(EVENT_DECRYPT_DISPLAY, text)
+
+    def _render_decrypt_display(self, text):
+        self.decrypt_viewer.set_text(text)
 
     def _start_status_updates(self):
         """Start periodic status updates"""
@@ -162,10 +172,17 @@ class MainWindow:
                 self.status_dot.configure(style="Active.TLabel", text="●")
                 self.status_label.configure(text="🔓 Force Decrypt Mode Active")
                 self.mode_label.configure(text="Mode: Force Decrypt (10s)")
+                # Also turned on from the tray; keep the radio buttons in step
+                if self.mode_var.get() != "decrypt":
+                    self.mode_var.set("decrypt")
             else:
                 self.status_dot.configure(style="Active.TLabel", text="●")
                 self.status_label.configure(text="🟢 Monitoring clipboard...")
                 self.mode_label.configure(text="Mode: Auto (Encrypt & Decrypt)")
+                # Force decrypt switches itself off after 10s; follow it
+                if self.mode_var.get() == "decrypt":
+                    self.mode_var.set("auto")
+            self.metrics_label.configure(text=live_summary())
 
             self.update_timer_id = self.root.after(1000, update_status)
 
@@ -177,12 +194,13 @@ class MainWindow:
             return
 
         mode = self.mode_var.get()
+        # Same path as the tray: fast polling burst and the 10s auto-disable
+        if (mode == "decrypt") != self.clipboard_monitor.force_decrypt:
+            self.clipboard_monitor.set_force_decrypt(mode == "decrypt")
         if mode == "decrypt":
-            self.clipboard_monitor.force_decrypt = True
             self.status_label.configure(text="🔓 Force Decrypt Mode Active")
             self.mode_label.configure(text="Mode: Force Decrypt (10s)")
         else:
-            self.clipboard_monitor.force_decrypt = False
             self.status_label.configure(text="🟢 Monitoring clipboard...")
             self.mode_label.configure(text="Mode: Auto (Encrypt & Decrypt)")
 
@@ -200,7 +218,10 @@ class MainWindow:
         self.root.withdraw()
 
     def show_window(self):
-        """Show and focus the main window"""
+        """Show and focus the main window; safe to call from any thread"""
+        self.dispatcher.post(EVENT_SHOW_WINDOW)
+
+    def _show_window(self):
         self.root.deiconify()
         self.root.lift()
         self.root.focus_force()
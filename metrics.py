@@ -0,0 +1,340 @@
+"""In-process metrics: counters and latency histograms for the hot paths.
+
+Metrics are plain objects updated inline (a lock and a bisect per
+observation) and read by exporters: a Prometheus text-format file written
+periodically, a localhost /metrics endpoint, and the live summary shown in
+the main window.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans sub-millisecond small payloads up to multi-second large ones
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Payload size classes used as a label, so latency can be compared by size
+SIZE_CLASSES = ((1024, "1k"), (64 * 1024, "64k"), (1024 * 1024, "1m"),
+                (16 * 1024 * 1024, "16m"))
+EXPORT_INTERVAL = 15.0
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def size_class(size):
+    """Label for a payload size: the smallest class it fits in"""
+    for limit, label in SIZE_CLASSES:
+        if size <= limit:
+            return label
+    return "large"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "count", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def percentile(self, q):
+        """Estimate the q-th quantile (0..1) by interpolating within buckets"""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Metric:
+    """A metric family; labels(*values) returns the child for those values"""
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def children(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def total(self):
+        return sum(child.value for _, child in self.children())
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+                for values, child in self.children()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = []
+        for values, child in self.children():
+            with child._lock:
+                counts = list(child.counts)
+                count, total = child.count, child.sum
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, values, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "secureclip_stage_seconds",
+    "Time spent per clipboard pipeline stage (detect, classify, crypt, clipboard_write, ui_dispatch)",
+    ("stage",))
+CRYPTO_SECONDS = REGISTRY.histogram(
+    "secureclip_crypto_seconds", "Encrypt/decrypt latency by payload size class", ("op", "size"))
+CRYPTO_BYTES = REGISTRY.counter(
+    "secureclip_crypto_bytes_total", "Bytes of plaintext encrypted or decrypted", ("op",))
+CLIPBOARD_EVENTS = REGISTRY.counter(
+    "secureclip_clipboard_events_total", "Handled clipboard changes by outcome", ("outcome",))
+CLIPBOARD_WRITES = REGISTRY.counter(
+    "secureclip_clipboard_writes_total", "Writes made to the clipboard by the app")
+CLIPBOARD_BYTES = REGISTRY.counter(
+    "secureclip_clipboard_bytes_total", "Characters read from or written to the clipboard",
+    ("direction",))
+KEY_EVENTS = REGISTRY.counter(
+    "secureclip_key_events_total", "Key manager events (generated, reloaded, pruned)", ("event",))
+ERRORS = REGISTRY.counter(
+    "secureclip_errors_total", "Errors by component", ("component",))
+
+
+def live_summary():
+    """Short text for the main window: operation counts and p95 stage latencies"""
+    outcomes = {values[0]: child.value for values, child in CLIPBOARD_EVENTS.children()}
+    lines = [f"Encrypted {outcomes.get('encrypted', 0)} · Decrypted {outcomes.get('decrypted', 0)}"
+             f" · Errors {ERRORS.total()}"]
+    stages = dict(STAGE_SECONDS.children())
+    latencies = []
+    for stage in ("detect", "classify", "crypt", "clipboard_write", "ui_dispatch"):
+        child = stages.get((stage,))
+        p95 = child.percentile(0.95) if child else None
+        if p95 is not None:
+            latencies.append(f"{stage.replace('clipboard_', '')} {p95 * 1000:.1f}ms")
+    if latencies:
+        lines.append("p95: " + " · ".join(latencies))
+    return "\n".join(lines)
+
+
+class MetricsFileExporter:
+    """Rewrite a Prometheus text file every interval (node_exporter textfile style)"""
+
+    def __init__(self, path, interval=EXPORT_INTERVAL, registry=REGISTRY, timers=None):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        if timers is None:
+            from timer_service import get_timer_service
+            timers = get_timer_service()
+        self.timers = timers
+        self._timer = None
+
+    def start(self):
+        self.write()
+        return self
+
+    def write(self):
+        try:
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w") as f:
+                f.write(self.registry.render())
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            logging.error(f"Error writing metrics to {self.path}: {e}")
+        self._timer = self.timers.schedule(self.interval, self.write)
+
+    def stop(self):
+        self.timers.cancel(self._timer)
+        self._timer = None
+
+
+class MetricsServer:
+    """Serve /metrics on localhost only"""
+
+    def __init__(self, port, host="127.0.0.1", registry=REGISTRY):
+        # Imported here: http.server is slow to import and rarely needed
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-http",
+                                        daemon=True)
+        self._thread.start()
+        logging.info(f"Serving metrics on http://127.0.0.1:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="write Prometheus metrics to PATH every few seconds")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+
+
+def start_exporters_from_args(args):
+    """Start the exporters requested on the command line; returns them"""
+    exporters = []
+    try:
+        if args.metrics_file:
+            exporters.append(MetricsFileExporter(args.metrics_file).start())
+        if args.metrics_port is not None:
+            exporters.append(MetricsServer(args.metrics_port).start())
+    except OSError as e:
+        logging.error(f"Error starting metrics export: {e}")
+    return exporters
@@ -1,168 +1,294 @@
+import collections
 import tkinter as tk
 from tkinter import ttk
-import threading
+import time
 import logging
-from PIL import Image, ImageDraw
+from timer_service import get_timer_service
+from ui_dispatcher import EVENT_NOTIFICATION
+
+# Windows are built once and reused; at most this many are visible at a time
+POOL_SIZE = 3
+# Notifications waiting for a free window; the oldest are dropped beyond this
+MAX_QUEUED = 20
+# Repeated notifications of these types collapse into "N items ..."
+COALESCE_TYPES = ("encrypt", "decrypt")
+
+WINDOW_WIDTH = 400
+FADE_STEP = 0.1
+FADE_INTERVAL_MS = 15
+PROGRESS_STEPS = 50
+MAX_PREVIEW_LENGTH = 50
+
+COLORS = {
+    # action type: (background, foreground, progress)
+    "encrypt": ("#E8F5E9", "#2E7D32", "#4CAF50"),  # green
+    "decrypt": ("#E3F2FD", "#1565C0", "#2196F3"),  # blue
+    "default": ("#F5F5F5", "#212121", "#9E9E9E"),  # gray
+}
+
+
+class _PooledWindow:
+    """A pre-built notification window and the state of what it shows"""
+
+    def __init__(self, index):
+        self.index = index
+        self.window = None
+        self.frame = None
+        self.title_label = None
+        self.message_label = None
+        self.content_label = None
+        self.progress = None
+        self.notification = None
+        self.phase = None
+        self.alpha = 0.0
+        self.shown_at = 0.0
+        self.after_id = None
+        # Lifetime timer on the shared TimerService, and the show it belongs to
+        self.expiry = None
+        self.generation = 0
+
 
 class NotificationWindow:
-    def __init__(self):
+    def __init__(self, timers=None):
+        # Notifications currently on screen
         self.notifications = []
-        self.animation_thread = None
+        self.timers = timers or get_timer_service()
         self.root = None
-        self.is_initialized = False
+        self.dispatcher = None
+        self._pool = []
+        self._free = []
+        self._pending = collections.deque()
+        self.dropped = 0
+        self.coalesced = 0
         logging.info("Notification system initialized")
 
-    def initialize_root(self):
-        """Initialize the root window if not already done"""
-        if not self.is_initialized:
-            if threading.current_thread() is threading.main_thread():
-                if self.root is None:
-                    self.root = tk.Tk()
-                    self.root.withdraw()
-                self.is_initialized = True
-                logging.info("Notification root window initialized")
-            else:
-                logging.warning("Attempted to initialize root from non-main thread")
+    def attach(self, root, dispatcher):
+        """Use the application's Tk root and UI dispatcher for notifications"""
+        self.root = root
+        self.dispatcher = dispatcher
+        dispatcher.register(EVENT_NOTIFICATION, self._enqueue)
+        dispatcher.call(self._build_pool)
+        logging.info("Notification system attached to main window")
 
     def show_notification(self, action_type, text_content=None):
         """Show an animated notification for encryption/decryption actions"""
         try:
-            # Initialize root window if needed
-            self.initialize_root()
-
-            # Ensure we're on the main thread for Tkinter operations
-            if threading.current_thread() is not threading.main_thread():
-                logging.info("Scheduling notification from background thread")
-                if self.root:
-                    self.root.after(0, lambda: self._show_notification_internal(action_type, text_content))
+            if self.dispatcher is None:
+                logging.info(f"No UI attached, skipping {action_type} notification")
                 return
-
-            self._show_notification_internal(action_type, text_content)
+            # Tk is only touched from the main loop, whichever thread calls this
+            self.dispatcher.post(EVENT_NOTIFICATION, action_type, text_content)
         except Exception as e:
             logging.error(f"Error showing notification: {e}")
 
-    def _show_notification_internal(self, action_type, text_content=None):
-        """Internal method to handle notification creation and display"""
+    def _build_pool(self):
+        """Create the reusable windows and styles once, on the UI thread"""
+        if self._pool:
+            return
         try:
-            # Create notification window
-            notification = self._create_notification(action_type, text_content)
-            if notification:
-                self.notifications.append(notification)
-
-                # Start animation in a separate thread
-                if self.animation_thread is None or not self.animation_thread.is_alive():
-                    self.animation_thread = threading.Thread(
-                        target=self._animate_notification,
-                        args=(notification,)
-                    )
-                    self.animation_thread.daemon = True
-                    self.animation_thread.start()
-                    logging.info(f"Started animation thread for {action_type} notification")
+            self._configure_styles()
+            for index in range(POOL_SIZE):
+                slot = self._create_window(index)
+                self._pool.append(slot)
+                self._free.append(slot)
+            logging.info(f"Built notification window pool ({POOL_SIZE} windows)")
+            self._show_next()
         except Exception as e:
-            logging.error(f"Error in _show_notification_internal: {e}")
+            logging.error(f"Error creating notification windows: {e}")
+
+    def _configure_styles(self):
+        """Configure one ttk style set per color scheme"""
+        style = ttk.Style(self.root)
+        for scheme, (bg_color, fg_color, progress_color) in COLORS.items():
+            prefix = scheme.capitalize()
+            style.configure(f"{prefix}.Notification.TFrame",
+                            background=bg_color)
+            style.configure(f"{prefix}.Notification.TLabel",
+                            font=("Segoe UI", 12, "bold"),
+                            background=bg_color,
+                            foreground=fg_color)
+            style.configure(f"{prefix}.Message.TLabel",
+                            font=("Segoe UI", 10),
+                            background=bg_color,
+                            foreground=fg_color)
+            style.configure(f"{prefix}.Content.TLabel",
+                            font=("Segoe UI", 9),
+                            background=bg_color,
+                            foreground=fg_color)
+            style.configure(f"{prefix}.Notification.Horizontal.TProgressbar",
+                            background=progress_color,
+                            troughcolor=bg_color)
+
+    def _create_window(self, index):
+        """Create one hidden notification window"""
+        slot = _PooledWindow(index)
+        window = tk.Toplevel(self.root)
+        window.withdraw()  # Hidden until used
+        window.attributes('-topmost', True)  # Keep on top
+        window.overrideredirect(True)  # Remove window decorations
+
+        slot.window = window
+        slot.frame = ttk.Frame(window, padding="12")
+        slot.frame.pack(fill=tk.BOTH, expand=True)
+        slot.title_label = ttk.Label(slot.frame)
+        slot.title_label.pack(pady=(0, 8))
+        slot.message_label = ttk.Label(slot.frame)
+        slot.message_label.pack(pady=(0, 4))
+        slot.content_label = ttk.Label(slot.frame, wraplength=360)  # Allow text wrapping
+        slot.progress = ttk.Progressbar(slot.frame, mode='determinate', length=360)
+        slot.progress.pack(pady=(4, 0))
+        return slot
+
+    def _enqueue(self, action_type, text_content=None):
+        """Queue a notification, merging bursts of the same kind (UI thread)"""
+        if action_type in COALESCE_TYPES:
+            for slot in self._pool:
+                notification = slot.notification
+                if notification and notification['action_type'] == action_type \
+                        and slot.phase != "fade_out":
+                    notification['count'] += 1
+                    notification['text'] = text_content
+                    self.coalesced += 1
+                    self._render(slot)
+                    # Keep it on screen for a full duration after the latest item
+                    if slot.phase == "hold":
+                        self._start_lifetime(slot)
+                    return
+            if self._pending and self._pending[-1]['action_type'] == action_type:
+                self._pending[-1]['count'] += 1
+                self._pending[-1]['text'] = text_content
+                self.coalesced += 1
+                return
+
+        self._pending.append({
+            'action_type': action_type,
+            'text': text_content,
+            'count': 1,
+            'duration': self._get_notification_duration(action_type),
+        })
+        while len(self._pending) > MAX_QUEUED:
+            self._pending.popleft()
+            self.dropped += 1
+        self._show_next()
+
+    def _show_next(self):
+        while self._pending and self._free:
+            slot = self._free.pop(0)
+            slot.notification = self._pending.popleft()
+            self.notifications.append(slot.notification)
+            self._start(slot)
+
+    def _render(self, slot):
+        """Fill a pooled window with its current notification"""
+        notification = slot.notification
+        action_type = notification['action_type']
+        count = notification['count']
+        text_content = notification['text']
+        prefix = (action_type if action_type in COLORS else "default").capitalize()
+
+        icon = "🔒" if action_type == "encrypt" else "🔓"
+        if count > 1:
+            title = f"{count} items {action_type}ed"
+        else:
+            title = self._get_notification_title(action_type)
+
+        slot.frame.configure(style=f"{prefix}.Notification.TFrame")
+        slot.title_label.configure(text=f"{icon} {title}", style=f"{prefix}.Notification.TLabel")
+        slot.message_label.configure(text=self._get_notification_message(action_type),
+                                     style=f"{prefix}.Message.TLabel")
+        slot.progress.configure(style=f"{prefix}.Notification.Horizontal.TProgressbar")
 
-    def _create_notification(self, action_type, text_content=None):
-        """Create a notification window with enhanced visual styling"""
+        # Show the actual text content if provided
+        if text_content:
+            # Truncate long text
+            displayed_text = text_content if len(text_content) <= MAX_PREVIEW_LENGTH \
+                else text_content[:MAX_PREVIEW_LENGTH] + "..."
+            slot.content_label.configure(text=displayed_text, style=f"{prefix}.Content.TLabel")
+            slot.content_label.pack(pady=(0, 8), before=slot.progress)
+        else:
+            slot.content_label.pack_forget()
+
+    def _start(self, slot):
         try:
-            window = tk.Toplevel() if self.root else tk.Tk()
-            window.withdraw()  # Hide initially
-            window.attributes('-topmost', True)  # Keep on top
-            window.overrideredirect(True)  # Remove window decorations
-
-            # Set window properties - make it wider for text content
-            window_width = 400
-            window_height = 160 if text_content else 120
+            self._render(slot)
+            window = slot.window
+            window_height = 160 if slot.notification['text'] else 120
             screen_width = window.winfo_screenwidth()
             screen_height = window.winfo_screenheight()
-            x_position = screen_width - window_width - 20
-            y_position = screen_height - window_height - 40
-
-            window.geometry(f'{window_width}x{window_height}+{x_position}+{y_position}')
-
-            # Configure styles with distinct colors
-            style = ttk.Style(window)
-            if action_type == "encrypt":
-                bg_color = "#E8F5E9"  # Light green
-                fg_color = "#2E7D32"  # Dark green
-                progress_color = "#4CAF50"
-            elif action_type == "decrypt":
-                bg_color = "#E3F2FD"  # Light blue
-                fg_color = "#1565C0"  # Dark blue
-                progress_color = "#2196F3"
+            x_position = screen_width - WINDOW_WIDTH - 20
+            # Stack visible notifications upwards from the bottom corner
+            y_position = screen_height - (window_height + 10) * (slot.index + 1) - 30
+            window.geometry(f'{WINDOW_WIDTH}x{window_height}+{x_position}+{y_position}')
+
+            slot.progress['value'] = 0
+            slot.generation += 1
+            slot.alpha = 0.0
+            window.attributes('-alpha', 0.0)
+            window.deiconify()
+            slot.phase = "fade_in"
+            self._step(slot)
+        except Exception as e:
+            logging.error(f"Error showing notification: {e}")
+            self._release(slot)
+
+    def _step(self, slot):
+        """Advance a notification's animation by one frame (after() callback)"""
+        slot.after_id = None
+        try:
+            if slot.phase == "fade_in":
+                slot.alpha = min(1.0, slot.alpha + FADE_STEP)
+                slot.window.attributes('-alpha', slot.alpha)
+                if slot.alpha >= 1.0:
+                    slot.phase = "hold"
+                    self._start_lifetime(slot)
+                delay = FADE_INTERVAL_MS
+            elif slot.phase == "hold":
+                # Only renders progress; the lifetime timer ends the hold phase
+                duration = slot.notification['duration']
+                elapsed = (time.monotonic() - slot.shown_at) * 1000
+                slot.progress['value'] = min(100, elapsed / duration * 100)
+                delay = max(FADE_INTERVAL_MS, duration // PROGRESS_STEPS)
             else:
-                bg_color = "#F5F5F5"  # Light gray
-                fg_color = "#212121"  # Dark gray
-                progress_color = "#9E9E9E"
-
-            style.configure("Notification.TFrame",
-                          background=bg_color)
-            style.configure("Notification.TLabel",
-                          font=("Segoe UI", 12, "bold"),
-                          background=bg_color,
-                          foreground=fg_color)
-            style.configure("Message.TLabel",
-                          font=("Segoe UI", 10),
-                          background=bg_color,
-                          foreground=fg_color)
-            style.configure("Content.TLabel",
-                          font=("Segoe UI", 9),
-                          background=bg_color,
-                          foreground=fg_color)
-            style.configure("Notification.Horizontal.TProgressbar",
-                          background=progress_color,
-                          troughcolor=bg_color)
-
-            # Create frame
-            frame = ttk.Frame(window, style="Notification.TFrame", padding="12")
-            frame.pack(fill=tk.BOTH, expand=True)
-
-            # Add content
-            icon = "🔒" if action_type == "encrypt" else "🔓"
-            title = self._get_notification_title(action_type)
-            message = self._get_notification_message(action_type)
-            duration = self._get_notification_duration(action_type)
-
-            # Title with icon
-            title_label = ttk.Label(frame,
-                                  text=f"{icon} {title}",
-                                  style="Notification.TLabel")
-            title_label.pack(pady=(0, 8))
-
-            # Message
-            message_label = ttk.Label(frame,
-                                    text=message,
-                                    style="Message.TLabel")
-            message_label.pack(pady=(0, 4))
-
-            # Show the actual text content if provided
-            if text_content:
-                # Truncate long text
-                max_length = 50
-                displayed_text = text_content if len(text_content) <= max_length else text_content[:max_length] + "..."
-
-                content_label = ttk.Label(frame,
-                                        text=displayed_text,
-                                        style="Content.TLabel",
-                                        wraplength=360)  # Allow text wrapping
-                content_label.pack(pady=(0, 8))
-
-            # Progress bar
-            progress = ttk.Progressbar(frame,
-                                     style="Notification.Horizontal.TProgressbar",
-                                     mode='determinate',
-                                     length=360)
-            progress.pack(pady=(4, 0))
-
-            window.update_idletasks()
-            return {
-                'window': window,
-                'progress': progress,
-                'duration': duration,
-                'action_type': action_type
-            }
+                slot.alpha = max(0.0, slot.alpha - FADE_STEP)
+                slot.window.attributes('-alpha', slot.alpha)
+                if slot.alpha <= 0.0:
+                    self._release(slot)
+                    return
+                delay = FADE_INTERVAL_MS
+            slot.after_id = self.root.after(delay, self._step, slot)
         except Exception as e:
-            logging.error(f"Error creating notification window: {e}")
-            return None
+            logging.error(f"Error in notification animation: {e}")
+            self._release(slot)
+
+    def _start_lifetime(self, slot):
+        """(Re)start the timer that ends a notification's hold phase"""
+        slot.shown_at = time.monotonic()
+        slot.expiry = self.timers.reschedule(
+            slot.expiry, slot.notification['duration'] / 1000,
+            self.dispatcher.call, self._expire, slot, slot.generation
+        )
+
+    def _expire(self, slot, generation):
+        """Lifetime timer callback, run on the UI thread via the dispatcher"""
+        if slot.generation == generation and slot.phase == "hold":
+            slot.phase = "fade_out"
+
+    def _release(self, slot):
+        """Hide a window, return it to the pool and show the next notification"""
+        self.timers.cancel(slot.expiry)
+        slot.expiry = None
+        try:
+            slot.window.withdraw()
+        except Exception:
+            pass
+        if slot.notification in self.notifications:
+            self.notifications.remove(slot.notification)
+            logging.info(f"Notification completed for {slot.notification['action_type']}")
+        slot.notification = None
+        slot.phase = None
+        if slot not in self._free:
+            self._free.append(slot)
+        self._show_next()
 
     def _get_notification_title(self, action_type):
         """Get the appropriate title for the notification"""
@@ -194,46 +320,3 @@ class NotificationWindow:
             "default": 3000   # 3 seconds
         }
         return durations.get(action_type, durations["default"])
-
-    def _animate_notification(self, notification):
-        """Animate the notification window with smooth transitions"""
-        if not notification:
-            return
-
-        try:
-            window = notification['window']
-            progress = notification['progress']
-            duration = notification['duration']
-
-            # Show window with fade-in
-            window.deiconify()
-            for alpha in range(0, 100, 4):
-                window.attributes('-alpha', alpha/100)
-                window.update()
-                window.after(8)
-
-            # Animate progress bar
-            steps = 50
-            step_duration = duration // steps
-            for i in range(steps + 1):
-                progress['value'] = (i / steps) * 100
-                window.update()
-                window.after(step_duration)
-
-            # Fade-out
-            for alpha in range(100, -1, -4):
-                window.attributes('-alpha', alpha/100)
-                window.update()
-                window.after(8)
-
-            # Cleanup
-            window.destroy()
-            self.notifications.remove(notification)
-            logging.info(f"Notification animation completed for {notification['action_type']}")
-        except Exception as e:
-            logging.error(f"Error in notification animation: {e}")
-            try:
-                if window and window.winfo_exists():
-                    window.destroy()
-            except:
-                pass
\ No newline at end of file
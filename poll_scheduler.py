@@ -0,0 +1,118 @@
+import collections
+import threading
+import time
+
+
+class AdaptivePollScheduler:
+    """Decide how long the monitor loop waits between clipboard reads.
+
+    While the clipboard is idle the interval grows exponentially from
+    ``fast_interval`` up to ``max_interval``. A detected change or user
+    activity (such as toggling force decrypt) drops back to the fast
+    interval for ``burst_window`` seconds. Consecutive errors use the same
+    policy, capped at ``max_error_interval``.
+    """
+
+    def __init__(self, fast_interval=0.05, idle_interval=0.25, max_interval=2.0,
+                 backoff_factor=1.5, burst_window=3.0, max_error_interval=30.0,
+                 clock=time.monotonic):
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.burst_window = burst_window
+        self.max_error_interval = max_error_interval
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._interval = idle_interval
+        self._burst_until = 0.0
+        self._consecutive_errors = 0
+        self._last_poll = None
+
+        # Tuning counters
+        self._poll_times = collections.deque()
+        self.total_polls = 0
+        self.total_changes = 0
+        self.total_errors = 0
+        self.last_detection_latency = None
+        self.max_detection_latency = 0.0
+        self._latency_sum = 0.0
+        self._latency_samples = 0
+
+    def next_interval(self):
+        """Return the delay before the next clipboard read"""
+        with self._lock:
+            if self._consecutive_errors:
+                delay = self.fast_interval * self.backoff_factor ** self._consecutive_errors
+                return min(delay, self.max_error_interval)
+            if self.clock() < self._burst_until:
+                return self.fast_interval
+            return self._interval
+
+    def record_poll(self, changed, event_driven=False):
+        """Account for one clipboard read and adapt the interval"""
+        now = self.clock()
+        with self._lock:
+            self.total_polls += 1
+            self._consecutive_errors = 0
+            self._poll_times.append(now)
+            self._trim_poll_times(now)
+
+            if changed:
+                self.total_changes += 1
+                # A poll can only tell that the change happened some time
+                # since the previous read, so that gap is the latency bound
+                if not event_driven and self._last_poll is not None:
+                    self._record_latency(now - self._last_poll)
+                self._enter_burst(now)
+            elif now >= self._burst_until:
+                self._interval = min(self._interval * self.backoff_factor, self.max_interval)
+
+            self._last_poll = now
+
+    def record_error(self):
+        """Account for a failed clipboard read"""
+        with self._lock:
+            self.total_errors += 1
+            self._consecutive_errors += 1
+
+    def notify_activity(self):
+        """Switch to burst mode after user activity such as a mode toggle"""
+        with self._lock:
+            self._enter_burst(self.clock())
+
+    @property
+    def consecutive_errors(self):
+        return self._consecutive_errors
+
+    def _enter_burst(self, now):
+        self._burst_until = now + self.burst_window
+        self._interval = max(self.fast_interval, self.idle_interval)
+
+    def _record_latency(self, latency):
+        self.last_detection_latency = latency
+        self.max_detection_latency = max(self.max_detection_latency, latency)
+        self._latency_sum += latency
+        self._latency_samples += 1
+
+    def _trim_poll_times(self, now):
+        while self._poll_times and now - self._poll_times[0] > 60.0:
+            self._poll_times.popleft()
+
+    def stats(self):
+        """Return counters used to tune the polling policy"""
+        with self._lock:
+            self._trim_poll_times(self.clock())
+            average = (self._latency_sum / self._latency_samples
+                       if self._latency_samples else None)
+            return {
+                "polls_per_minute": len(self._poll_times),
+                "current_interval": self._interval,
+                "total_polls": self.total_polls,
+                "total_changes": self.total_changes,
+                "total_errors": self.total_errors,
+                "last_detection_latency": self.last_detection_latency,
+                "avg_detection_latency": average,
+                "max_detection_latency": self.max_detection_latency,
+            }
@@ -0,0 +1,150 @@
+"""On-demand sampling profiler for the running app.
+
+While started, a background thread snapshots the stack of every other
+thread (monitor, tray, Tk main loop, timers, ...) with
+sys._current_frames() at a fixed interval. Nothing is hooked into the
+profiled threads, so overhead is one short stack walk per interval while
+running and zero while stopped.
+
+Stopping writes two files:
+  *.collapsed  one "thread;outer;...;inner count" line per stack, the input
+               format of flamegraph.pl, speedscope and inferno
+  *.prof       a pstats dump (python -m pstats, snakeviz) built from the
+               samples; cProfile itself only instruments the thread that
+               enables it, so it could not cover the other threads
+"""
+import collections
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+
+DEFAULT_INTERVAL = 0.01
+# Profiles stop themselves after this long in case they are forgotten
+MAX_DURATION = 15 * 60
+MAX_DEPTH = 128
+
+
+def default_output_dir():
+    base = os.environ.get("LOCALAPPDATA") if sys.platform == 'win32' else None
+    base = base or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "SecureClipboard", "profiles")
+
+
+class SamplingProfiler:
+    def __init__(self, interval=DEFAULT_INTERVAL, output_dir=None, max_duration=MAX_DURATION):
+        self.interval = interval
+        self.output_dir = output_dir or default_output_dir()
+        self.max_duration = max_duration
+        # (thread name, (code, ...) outermost first) -> samples
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._labels = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        logging.info(f"Sampling profiler started ({1 / self.interval:.0f} Hz)")
+
+    def stop(self):
+        """Stop sampling and write the profile; returns (collapsed path, pstats path)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.stopped_at = time.time()
+        try:
+            return self.save()
+        except OSError as e:
+            logging.error(f"Error saving profile: {e}")
+            return None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.max_duration
+        while not self._stop_event.wait(self.interval):
+            self.sample(own_id)
+            if time.monotonic() >= deadline:
+                logging.warning("Profiler reached its time limit and stopped sampling")
+                break
+
+    def sample(self, skip_thread=None):
+        """Record the current stack of every thread except skip_thread"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            codes = []
+            while frame is not None and len(codes) < MAX_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            codes.reverse()
+            self.stacks[names.get(thread_id, f"thread-{thread_id}"), tuple(codes)] += 1
+        self.samples += 1
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            label = self._labels[code] = label.replace(";", ":")
+        return label
+
+    def collapsed(self):
+        """Flamegraph input: one line per distinct stack, rooted at the thread name"""
+        lines = []
+        for (thread_name, codes), count in self.stacks.most_common():
+            frames = [thread_name.replace(";", ":")] + [self._label(code) for code in codes]
+            lines.append(f"{';'.join(frames)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def pstats_data(self):
+        """pstats-compatible dict built from samples (times are sample-weighted)"""
+        stats = {}
+        for (_, codes), count in self.stacks.items():
+            seconds = count * self.interval
+            keys = [(code.co_filename, code.co_firstlineno, code.co_name) for code in codes]
+            seen = set()
+            for depth, key in enumerate(keys):
+                cc, nc, tt, ct, callers = stats.get(key, (0, 0, 0.0, 0.0, {}))
+                nc += count
+                if key not in seen:
+                    # Recursive frames count towards inclusive time once per sample
+                    cc += count
+                    ct += seconds
+                    seen.add(key)
+                if depth == len(keys) - 1:
+                    tt += seconds
+                if depth:
+                    caller = keys[depth - 1]
+                    c_cc, c_nc, c_tt, c_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (c_cc + count, c_nc + count,
+                                       c_tt + (seconds if depth == len(keys) - 1 else 0.0),
+                                       c_ct + seconds)
+                stats[key] = (cc, nc, tt, ct, callers)
+        return stats
+
+    def save(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at or time.time()))
+        base = os.path.join(self.output_dir, f"profile-{stamp}-{os.getpid()}")
+        with open(base + ".collapsed", "w") as f:
+            f.write(self.collapsed())
+        with open(base + ".prof", "wb") as f:
+            marshal.dump(self.pstats_data(), f)
+        logging.info(f"Saved profile ({self.samples} samples, {len(self.stacks)} stacks) "
+                     f"to {base}.collapsed and {base}.prof")
+        return base + ".collapsed", base + ".prof"
@@ -1,35 +1,150 @@
+import argparse
+import base64
+import getpass
+import os
 import threading
 import sys
 import logging
-from clipboard_monitor import ClipboardMonitor
-from system_tray import SystemTrayIcon
-from key_manager import KeyManager
-from main_window import MainWindow
+from concurrent.futures import ThreadPoolExecutor
+from log_pipeline import add_logging_arguments, setup_logging_from_args
+from metrics import add_metrics_arguments, start_exporters_from_args
+from startup_profile import StartupProfile
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Startup timing starts as soon as this module is imported
+startup_profile = StartupProfile(enabled=False)
 
-def main():
-    try:
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Secure Clipboard")
+    parser.add_argument("--team", action="store_true",
+                        help="use a key derived from a shared team passphrase "
+                             "(read from SECURECLIP_TEAM_PASSPHRASE or prompted)")
+    parser.add_argument("--team-salt",
+                        help="base64 team salt shared by all teammates (saved after first use)")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a display: serve encrypt/decrypt over a Unix socket")
+    parser.add_argument("--socket", help="socket path for --headless")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print a per-phase startup timing breakdown to stderr")
+    parser.add_argument("--startup-budget", type=float, metavar="MS",
+                        help="with --startup-profile, flag startups slower than MS milliseconds")
+    parser.add_argument("--history", action="store_true",
+                        help="keep an encrypted history of clipboard items (see cli.py history)")
+    parser.add_argument("--history-days", type=float, default=7,
+                        help="days of history to keep (default 7)")
+    add_logging_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser.parse_args(argv)
+
+def read_team_passphrase():
+    return os.environ.get("SECURECLIP_TEAM_PASSPHRASE") or getpass.getpass("Team passphrase: ")
+
+def enable_team_mode(key_manager, team_salt=None, passphrase=None):
+    """Derive and activate the team key from the shared passphrase"""
+    from utils import generate_salt
+    settings = key_manager.get_team_settings()
+    kdf_params = settings[1] if settings else {}
+    if team_salt:
+        salt = base64.urlsafe_b64decode(team_salt)
+    elif settings:
+        salt = settings[0]
+    else:
+        salt = generate_salt()
+        logging.info(f"Generated new team salt, share it with teammates: "
+                     f"{base64.urlsafe_b64encode(salt).decode()}")
+
+    passphrase = passphrase or read_team_passphrase()
+    key_manager.enable_team_key(passphrase, salt, **kdf_params)
+
+def load_keys(args, passphrase=None):
+    """Load (or create) the encryption key and build the Encryption service"""
+    with startup_profile.phase("import crypto"):
+        from key_manager import get_key_manager
+        from encryption import Encryption
+    with startup_profile.phase("key load"):
         # Initialize key manager and ensure a key exists
         logging.info("Initializing key manager...")
-        key_manager = KeyManager()
+        key_manager = get_key_manager()
         encryption_key = key_manager.get_encryption_key()
 
         if not encryption_key:
             logging.info("No encryption key found, generating new key...")
             key_manager.generate_new_key()
 
+        if args.team:
+            enable_team_mode(key_manager, args.team_salt, passphrase)
+    with startup_profile.phase("encryption init"):
+        return Encryption(key_manager=key_manager)
+
+def probe_clipboard():
+    """Create the clipboard backend and check it can be read"""
+    with startup_profile.phase("clipboard probe"):
+        from clipboard_backend import create_backend
+        backend = create_backend()
+        backend.paste()
+        logging.info(f"Clipboard access verified ({backend.name} backend)")
+        return backend
+
+def start_tray():
+    """Show the tray icon before anything else; returns it once visible"""
+    with startup_profile.phase("tray import"):
+        from system_tray import SystemTrayIcon
+    with startup_profile.phase("tray icon"):
+        tray_icon = SystemTrayIcon()
+    tray_thread = threading.Thread(target=tray_icon.run, name="tray", daemon=True)
+    tray_thread.start()
+    return tray_icon
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging_from_args(args)
+    start_exporters_from_args(args)
+    startup_profile.enabled = args.startup_profile
+    startup_profile.mark("args parsed")
+    try:
+        # Prompt before starting threads so the prompt is not interleaved
+        passphrase = read_team_passphrase() if args.team else None
+
+        if args.headless:
+            encryption = load_keys(args, passphrase)
+            if args.startup_profile:
+                startup_profile.mark("daemon starting")
+                print(startup_profile.report(), file=sys.stderr)
+            from daemon import run_daemon
+            run_daemon(args.socket, encryption)
+            return
+
+        # Staged startup: the tray goes up first while keys load and the
+        # clipboard is probed in parallel; tkinter loads on this thread
+        startup = ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup")
+        tray_future = startup.submit(start_tray)
+        keys_future = startup.submit(load_keys, args, passphrase)
+        backend_future = startup.submit(probe_clipboard)
+
+        with startup_profile.phase("window import"):
+            from main_window import MainWindow
+            from clipboard_monitor import ClipboardMonitor
+
         # Initialize main window first (without clipboard monitor)
         logging.info("Initializing main window...")
-        main_window = MainWindow()
+        with startup_profile.phase("window build"):
+            main_window = MainWindow()
+
+        encryption = keys_future.result()
+        history = None
+        if args.history:
+            from history_store import HistoryStore
+            history = HistoryStore(encryption=encryption, max_age=args.history_days * 86400)
 
         # Initialize clipboard monitor with error handling
         logging.info("Initializing clipboard monitor...")
-        try:
-            clipboard_monitor = ClipboardMonitor()
-        except Exception as e:
-            logging.error(f"Failed to initialize clipboard monitor: {e}")
-            raise RuntimeError("Could not access clipboard. Please ensure you have the necessary permissions.")
+        with startup_profile.phase("monitor init"):
+            try:
+                backend = backend_future.result()
+                clipboard_monitor = ClipboardMonitor(backend=backend, verify_access=False,
+                                                     encryption=encryption, history=history)
+            except Exception as e:
+                logging.error(f"Failed to initialize clipboard monitor: {e}")
+                raise RuntimeError("Could not access clipboard. Please ensure you have the necessary permissions.")
 
         clipboard_monitor.set_main_window(main_window)
         main_window.set_clipboard_monitor(clipboard_monitor)
@@ -38,16 +153,24 @@ def main():
         monitor_thread = threading.Thread(target=clipboard_monitor.start_monitoring, daemon=True)
         monitor_thread.start()
 
-        # Initialize and start system tray
         logging.info("Initializing system tray...")
-        tray_icon = SystemTrayIcon(clipboard_monitor, main_window)
+        tray_icon = tray_future.result()
+        tray_icon.attach(clipboard_monitor, main_window)
+        startup.shutdown(wait=False)
+
+        if args.startup_profile:
+            budget = args.startup_budget / 1000 if args.startup_budget else None
+
+            def report_startup():
+                startup_profile.mark("window interactive")
+                print(startup_profile.report(budget), file=sys.stderr)
 
-        # Create a thread for the system tray
-        tray_thread = threading.Thread(target=tray_icon.run, daemon=True)
-        tray_thread.start()
+            main_window.root.after_idle(report_startup)
 
         # Run the main window (this will block until the window is closed)
         main_window.run()
+        if history is not None:
+            history.close()
 
     except Exception as e:
         logging.error(f"Application startup failed: {e}")
@@ -58,4 +181,4 @@ if __name__ == "__main__":
         main()
     except Exception as e:
         logging.error(f"Fatal error: {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,57 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Records how long each startup phase takes, on whichever thread runs it.
+
+    Phases overlap when they run in parallel, so the report lists each
+    phase's start and end relative to startup rather than summing them.
+    """
+
+    def __init__(self, enabled=True, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.started_at = clock()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, start, self.clock())
+
+    def record(self, name, start, end):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.phases.append((name, threading.current_thread().name,
+                                start - self.started_at, end - self.started_at))
+
+    def mark(self, name):
+        """Record an instant, e.g. the moment the window became interactive"""
+        now = self.clock()
+        self.record(name, now, now)
+
+    def elapsed(self):
+        return self.clock() - self.started_at
+
+    def report(self, budget=None):
+        """Per-phase timing table, sorted by start time"""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda phase: phase[2])
+        lines = [f"{'phase':<28} {'thread':<16} {'start':>9} {'end':>9} {'took':>9}"]
+        for name, thread, start, end in phases:
+            lines.append(f"{name:<28} {thread[:16]:<16} {start * 1000:>7.1f}ms "
+                         f"{end * 1000:>7.1f}ms {(end - start) * 1000:>7.1f}ms")
+        total = max((end for _, _, _, end in phases), default=0.0)
+        summary = f"ready after {total * 1000:.1f}ms"
+        if budget is not None:
+            summary += f" (budget {budget * 1000:.0f}ms, " \
+                       f"{'OK' if total <= budget else 'EXCEEDED'})"
+        lines.append(summary)
+        return "\n".join(lines)
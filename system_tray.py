@@ -1,59 +1,104 @@
+import os
 import pystray
 import logging
 from PIL import Image, ImageDraw
 import threading
 import sys
-from key_manager import KeyManager
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Bump when the drawing changes so stale cached icons are not reused
+ICON_VERSION = 1
+ICON_SIZE = (32, 32)
+
 
 class NotificationWindow:
     def show_notification(self, message_type):
         if message_type == "startup":
             print("Secure Clipboard is running - Look for the blue lock icon in your system tray (bottom right corner)")
 
+def icon_cache_path():
+    """Where the rendered tray icon is kept between launches"""
+    base = os.environ.get("LOCALAPPDATA") if sys.platform == 'win32' else None
+    base = base or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "SecureClipboard",
+                        f"tray-icon-v{ICON_VERSION}-{ICON_SIZE[0]}x{ICON_SIZE[1]}.png")
+
+
+def load_icon_image():
+    """Load the cached tray icon, rendering and caching it on first launch"""
+    path = icon_cache_path()
+    try:
+        with Image.open(path) as cached:
+            cached.load()
+            return cached.copy()
+    except (OSError, ValueError):
+        pass
+
+    icon_image = render_icon_image()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        icon_image.save(path + ".tmp", "PNG")
+        os.replace(path + ".tmp", path)
+        logging.info(f"Cached tray icon at {path}")
+    except OSError as e:
+        logging.warning(f"Could not cache tray icon: {e}")
+    return icon_image
+
+
+def render_icon_image():
+    """Draw the lock icon"""
+    # Create a Windows-friendly icon (32x32 pixels for better visibility)
+    icon_size = ICON_SIZE
+    icon_image = Image.new('RGBA', icon_size, color=(0, 0, 0, 0))
+    draw = ImageDraw.Draw(icon_image)
+
+    # Draw a more visible lock symbol optimized for Windows
+    padding = 4
+    body_width = icon_size[0] - 2 * padding
+    body_height = int(icon_size[1] * 0.6)
+
+    # Draw lock body (bright blue with white outline for better visibility)
+    draw.rectangle(
+        (padding, icon_size[1] - body_height - padding,
+         icon_size[0] - padding, icon_size[1] - padding),
+        fill='#1E90FF', outline='white', width=2
+    )
+
+    # Draw lock shackle (thicker for visibility)
+    shackle_width = int(body_width * 0.6)
+    shackle_x = (icon_size[0] - shackle_width) // 2
+    draw.arc(
+        (shackle_x, icon_size[1] - body_height - padding - 4,
+         shackle_x + shackle_width, icon_size[1] - body_height + padding),
+        180, 0, fill='white', width=3
+    )
+    logging.info("Created system tray icon image (Windows optimized)")
+    return icon_image
+
+
 class SystemTrayIcon:
-    def __init__(self, clipboard_monitor, main_window):
-        self.key_manager = KeyManager()
+    def __init__(self, clipboard_monitor=None, main_window=None):
+        # The tray is shown first; the monitor and window are attached once ready
         self.clipboard_monitor = clipboard_monitor
         self.main_window = main_window
         self.notification = NotificationWindow()
+        # Only exists while profiling, so there is no cost when it is off
+        self.profiler = None
         self.create_icon()
         logging.info("System tray icon initialized")
 
+    def attach(self, clipboard_monitor, main_window):
+        """Connect the menu to the monitor and window once they are up"""
+        self.clipboard_monitor = clipboard_monitor
+        self.main_window = main_window
+        self.icon.title = "Secure Clipboard (Active - Auto Mode)"
+
     def create_icon(self):
         """Create system tray icon and menu"""
-        # Create a Windows-friendly icon (32x32 pixels for better visibility)
-        icon_size = (32, 32)
-        icon_image = Image.new('RGBA', icon_size, color=(0, 0, 0, 0))
-        draw = ImageDraw.Draw(icon_image)
-
-        # Draw a more visible lock symbol optimized for Windows
-        padding = 4
-        body_width = icon_size[0] - 2 * padding
-        body_height = int(icon_size[1] * 0.6)
-
-        # Draw lock body (bright blue with white outline for better visibility)
-        draw.rectangle(
-            (padding, icon_size[1] - body_height - padding,
-             icon_size[0] - padding, icon_size[1] - padding),
-            fill='#1E90FF', outline='white', width=2
-        )
-
-        # Draw lock shackle (thicker for visibility)
-        shackle_width = int(body_width * 0.6)
-        shackle_x = (icon_size[0] - shackle_width) // 2
-        draw.arc(
-            (shackle_x, icon_size[1] - body_height - padding - 4,
-             shackle_x + shackle_width, icon_size[1] - body_height + padding),
-            180, 0, fill='white', width=3
-        )
+        icon_image = load_icon_image()
 
         # Show startup notification
         self.notification.show_notification("startup")
 
-        logging.info("Created system tray icon image (Windows optimized)")
-
         # Windows-friendly menu with clear instructions
         menu = (
             pystray.MenuItem(
@@ -69,6 +114,10 @@ class SystemTrayIcon:
                 "Generate New Key",
                 self.generate_new_key
             ),
+            pystray.MenuItem(
+                lambda item: "Stop Profiling" if self.profiler else "Start Profiling",
+                self.toggle_profiling
+            ),
             pystray.MenuItem(
                 "Exit Secure Clipboard",
                 self.quit_application
@@ -78,14 +127,16 @@ class SystemTrayIcon:
         self.icon = pystray.Icon(
             "SecureClipboard",
             icon_image,
-            "Secure Clipboard (Active - Auto Mode)",  # Removed shortcut from tooltip
+            "Secure Clipboard (Starting...)"
+            if self.clipboard_monitor is None else "Secure Clipboard (Active - Auto Mode)",
             menu
         )
         logging.info("System tray menu created with Windows-friendly options")
 
     def show_main_window(self):
         """Show the main control panel window"""
-        self.main_window.show_window()
+        if self.main_window:
+            self.main_window.show_window()
 
     def run(self):
         """Run the system tray icon"""
@@ -98,6 +149,8 @@ class SystemTrayIcon:
 
     def toggle_decrypt(self):
         """Toggle decrypt mode"""
+        if not self.clipboard_monitor:
+            return
         is_active = self.clipboard_monitor.toggle_force_decrypt()
         status = "Force Decrypt" if is_active else "Auto"
         self.icon.title = f"Secure Clipboard (Active - {status} Mode)"
@@ -106,16 +159,36 @@ class SystemTrayIcon:
     def generate_new_key(self):
         """Generate a new encryption key"""
         try:
-            self.key_manager.generate_new_key()
+            from key_manager import get_key_manager
+            get_key_manager().generate_new_key()
             self.icon.title = "Secure Clipboard (Active - New Key Generated)"
             logging.info("Generated new encryption key")
         except Exception as e:
             self.icon.title = "Secure Clipboard (Active - Key Generation Failed)"
             logging.error(f"Error generating new key: {e}")
 
+    def toggle_profiling(self):
+        """Start the sampling profiler, or stop it and save the profile"""
+        try:
+            if self.profiler is None:
+                from profiler import SamplingProfiler
+                self.profiler = SamplingProfiler()
+                self.profiler.start()
+                self.icon.title = "Secure Clipboard (Profiling...)"
+            else:
+                profiler, self.profiler = self.profiler, None
+                paths = profiler.stop()
+                status = "Profile Saved" if paths else "Profile Failed"
+                self.icon.title = f"Secure Clipboard (Active - {status})"
+            self.icon.update_menu()
+        except Exception as e:
+            logging.error(f"Error toggling profiler: {e}")
+
     def quit_application(self):
         """Exit the application"""
         logging.info("Application shutdown requested")
+        if self.profiler is not None:
+            self.profiler.stop()
         try:
             self.icon.stop()
         except Exception as e:
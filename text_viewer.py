@@ -0,0 +1,356 @@
+import bisect
+import re
+import tkinter as tk
+from array import array
+from tkinter import ttk
+
+# Long lines are split into display lines of at most this many characters
+MAX_LINE_LENGTH = 200
+VISIBLE_LINES = 6
+# Work done per after() tick, so a huge text never blocks the main loop
+INDEX_CHARS_PER_TICK = 1024 * 1024
+SEARCH_CHARS_PER_TICK = 4 * 1024 * 1024
+TICK_MS = 1
+
+
+class LineIndex:
+    """Start offsets of the display lines of a text, built incrementally.
+
+    Offsets are kept in an array of 64-bit ints rather than a list of line
+    strings, so the text is never split or copied.
+    """
+
+    def __init__(self, text, max_line_length=MAX_LINE_LENGTH):
+        self.text = text
+        self.max_line_length = max_line_length
+        self.offsets = array('q', [0])
+        # Everything before this offset has been indexed
+        self.scanned = 0
+
+    @property
+    def complete(self):
+        return self.scanned >= len(self.text)
+
+    def extend(self, max_chars=INDEX_CHARS_PER_TICK):
+        """Index up to max_chars more characters; returns True when done"""
+        text = self.text
+        end = min(len(text), self.scanned + max_chars)
+        position = self.offsets[-1]
+        while position < end:
+            newline = text.find('\n', position, position + self.max_line_length)
+            position = newline + 1 if newline != -1 else position + self.max_line_length
+            if position < len(text):
+                self.offsets.append(position)
+        self.scanned = max(end, position)
+        return self.complete
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def line(self, number):
+        start = self.offsets[number]
+        if number + 1 < len(self.offsets):
+            end = self.offsets[number + 1]
+        else:
+            newline = self.text.find('\n', start, start + self.max_line_length)
+            end = newline + 1 if newline != -1 else start + self.max_line_length
+        return self.text[start:end].rstrip('\r\n')
+
+    def line_of(self, offset):
+        """Display line containing a character offset"""
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+
+class DecryptedTextViewer:
+    """Shows decrypted text without ever laying out more than a screenful.
+
+    Only the visible display lines are inserted into the Text widget; the
+    line index and searches advance a slice at a time on after() ticks.
+    Jumps past the indexed part (scrollbar drags, search hits) show the
+    lines at that character offset straight away and switch to the line
+    number once the indexer gets there. Nothing is rendered until the user
+    asks to reveal the text.
+    """
+
+    def __init__(self, parent, visible_lines=VISIBLE_LINES):
+        self.visible_lines = visible_lines
+        self.text = None
+        self.index = None
+        self.top = 0
+        # Character offset of the top line while the index has not reached it
+        self.anchor = None
+        # (start offset, line) of each rendered line
+        self._visible = []
+        self.revealed = False
+        self._index_job = None
+        self._search_job = None
+        self._match = None
+
+        self.frame = ttk.Frame(parent)
+        controls = ttk.Frame(self.frame)
+        controls.pack(fill=tk.X)
+        self.reveal_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Reveal", variable=self.reveal_var,
+                        command=self._toggle_reveal).pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(controls, textvariable=self.search_var, width=18)
+        self.search_entry.pack(side=tk.LEFT, padx=(10, 4))
+        self.search_entry.bind('<Return>', lambda event: self.search_next())
+        ttk.Button(controls, text="Find", width=5, command=self.search_next).pack(side=tk.LEFT)
+        self.info_label = ttk.Label(controls, style="Status.TLabel")
+        self.info_label.pack(side=tk.RIGHT)
+
+        body = ttk.Frame(self.frame)
+        body.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        self.text_widget = tk.Text(body, height=visible_lines, width=40, wrap=tk.NONE,
+                                   font=('Consolas', 9), foreground='#1565C0',
+                                   borderwidth=0, highlightthickness=0)
+        self.text_widget.tag_configure('match', background='#FFF59D')
+        self.scrollbar = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self._on_scrollbar)
+        # Display lines are up to MAX_LINE_LENGTH characters, wider than the widget
+        self.x_scrollbar = ttk.Scrollbar(body, orient=tk.HORIZONTAL, command=self.text_widget.xview)
+        self.text_widget.configure(xscrollcommand=self.x_scrollbar.set)
+        self.x_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        for widget in (self.text_widget, self.scrollbar):
+            widget.bind('<MouseWheel>', self._on_mousewheel)
+            widget.bind('<Button-4>', lambda event: self.scroll_lines(-3))
+            widget.bind('<Button-5>', lambda event: self.scroll_lines(3))
+        self._show_message("Decrypted text will appear here")
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_text(self, text):
+        """Replace the displayed text; cheap regardless of its size"""
+        self._cancel_jobs()
+        self.text = text or None
+        self.index = LineIndex(self.text) if self.text else None
+        self.top = 0
+        self.anchor = None
+        self._visible = []
+        self._match = None
+        if self.text is None:
+            self._show_message("Decrypted text will appear here")
+            self.info_label.configure(text="")
+        elif self.revealed:
+            self._start_indexing()
+            self._render()
+        else:
+            self._show_hidden()
+
+    def _toggle_reveal(self):
+        self.revealed = self.reveal_var.get()
+        if self.text is None:
+            return
+        if self.revealed:
+            self._start_indexing()
+            self._render()
+        else:
+            self._cancel_jobs()
+            self._show_hidden()
+
+    def _show_hidden(self):
+        self._show_message(f"Decrypted text hidden ({len(self.text):,} characters). "
+                           "Tick Reveal to show it.")
+        self.info_label.configure(text="")
+
+    def _show_message(self, message):
+        widget = self.text_widget
+        widget.configure(state=tk.NORMAL)
+        widget.delete('1.0', tk.END)
+        widget.insert('1.0', message)
+        widget.configure(state=tk.DISABLED)
+        self.scrollbar.set(0.0, 1.0)
+
+    def _start_indexing(self):
+        if self._index_job is None and not self.index.complete:
+            self._index_job = self.frame.after(TICK_MS, self._index_step)
+
+    def _index_step(self):
+        self._index_job = None
+        if self.index is None:
+            return
+        if not self.index.extend():
+            self._index_job = self.frame.after(TICK_MS, self._index_step)
+        if self.anchor is not None and self.anchor < self.index.scanned:
+            # Caught up with a jump: switch from the offset to its line number
+            self._render()
+        else:
+            # The scrollbar and line count grow as indexing progresses
+            self._update_scrollbar()
+
+    def _cancel_jobs(self):
+        for job in (self._index_job, self._search_job):
+            if job is not None:
+                self.frame.after_cancel(job)
+        self._index_job = None
+        self._search_job = None
+
+    def _render(self):
+        """Insert only the visible display lines into the Text widget"""
+        if not self.revealed or self.index is None:
+            return
+        index = self.index
+        if self.anchor is not None and self.anchor < index.scanned:
+            self.top = index.line_of(self.anchor)
+            self.anchor = None
+        if self.anchor is not None:
+            self._visible = self._lines_from(self.anchor, self.visible_lines)
+            # Near the end, back up so the view stays full
+            while len(self._visible) < self.visible_lines and self.anchor > 0:
+                self.anchor = self._line_start_before(self.anchor)
+                self._visible = self._lines_from(self.anchor, self.visible_lines)
+        else:
+            # Scrolling a little past what is indexed so far pulls the index along
+            while self.top + self.visible_lines > len(index) and not index.complete:
+                index.extend()
+            self.top = max(0, min(self.top, len(index) - self.visible_lines))
+            last = min(len(index), self.top + self.visible_lines)
+            self._visible = [(index.offsets[number], index.line(number))
+                             for number in range(self.top, last)]
+
+        widget = self.text_widget
+        # Replacing the lines resets the horizontal position, so keep it
+        x_position = widget.xview()[0]
+        widget.configure(state=tk.NORMAL)
+        widget.delete('1.0', tk.END)
+        widget.insert('1.0', '\n'.join(line for _, line in self._visible))
+        widget.xview_moveto(x_position)
+        if self._match is not None:
+            self._highlight(*self._match)
+        widget.configure(state=tk.DISABLED)
+        self._update_scrollbar()
+
+    def _lines_from(self, offset, count):
+        """(start, line) for up to count display lines from offset, without the index"""
+        text, width = self.text, self.index.max_line_length
+        lines = []
+        while offset < len(text) and len(lines) < count:
+            newline = text.find('\n', offset, offset + width)
+            end = newline + 1 if newline != -1 else offset + width
+            lines.append((offset, text[offset:end].rstrip('\r\n')))
+            offset = end
+        return lines
+
+    def _line_start_before(self, offset):
+        """Estimated start of the display line before the one at offset"""
+        width = self.index.max_line_length
+        if offset <= 0:
+            return 0
+        # offset - 1 is the previous line's last character (its newline, if any)
+        newline = self.text.rfind('\n', max(0, offset - 1 - width), offset - 1)
+        return newline + 1 if newline != -1 else max(0, offset - width)
+
+    def _jump_to(self, offset, lines_above=0):
+        """Show the line holding a character offset without indexing up to it"""
+        offset = max(0, min(offset, len(self.text) - 1))
+        if offset < self.index.scanned:
+            self.anchor = None
+            self.top = max(0, self.index.line_of(offset) - lines_above)
+        else:
+            # Start of the line holding offset, then lines_above more lines up
+            anchor = self._line_start_before(offset + 1)
+            for _ in range(lines_above):
+                anchor = self._line_start_before(anchor)
+            self.anchor = anchor
+            self._start_indexing()
+        self._render()
+
+    def _highlight(self, start, end):
+        """Tag the part of a match that falls inside the visible lines"""
+        for row, (line_start, line) in enumerate(self._visible):
+            line_end = line_start + len(line)
+            if start < line_end and end > line_start:
+                self.text_widget.tag_add('match', f"{row + 1}.{max(start, line_start) - line_start}",
+                                         f"{row + 1}.{min(end, line_end) - line_start}")
+
+    def _update_scrollbar(self):
+        if self.index is None or not self.revealed:
+            return
+        if self.anchor is not None:
+            position = self.anchor / len(self.text)
+            self.scrollbar.set(position, min(1.0, position + self.visible_lines / max(len(self.index), 1)))
+            self.info_label.configure(text=f"{len(self.text):,} chars (indexing...)")
+            return
+        # Until indexing finishes, estimate the total from the indexed fraction
+        total = len(self.index)
+        if not self.index.complete and self.index.scanned:
+            total = max(total, int(total * len(self.text) / self.index.scanned))
+        total = max(total, 1)
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_lines) / total))
+        state = "" if self.index.complete else " (indexing...)"
+        self.info_label.configure(text=f"{len(self.text):,} chars{state}")
+
+    def scroll_lines(self, count):
+        if not self.revealed or self.index is None:
+            return
+        if self.anchor is None:
+            self.top = max(0, self.top + count)
+        elif count > 0:
+            lines = self._lines_from(self.anchor, count + 1)
+            self.anchor = lines[-1][0] if lines else self.anchor
+        else:
+            for _ in range(-count):
+                self.anchor = self._line_start_before(self.anchor)
+        self._render()
+
+    def _on_mousewheel(self, event):
+        self.scroll_lines(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if not self.revealed or self.index is None:
+            return
+        if action == tk.MOVETO:
+            # Never indexes synchronously: the indexer catches up on after() ticks
+            self._jump_to(int(float(value) * len(self.text)))
+        elif action == tk.SCROLL:
+            step = self.visible_lines if unit == tk.PAGES else 1
+            self.scroll_lines(int(value) * step)
+
+    def search_next(self):
+        """Find the next occurrence of the search text, a slice per tick"""
+        query = self.search_var.get()
+        if not query or self.text is None:
+            return
+        if not self.revealed:
+            self.reveal_var.set(True)
+            self._toggle_reveal()
+        if self._search_job is not None:
+            self.frame.after_cancel(self._search_job)
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        start = self._match[0] + 1 if self._match else 0
+        self.info_label.configure(text="Searching...")
+        self._search_job = self.frame.after(TICK_MS, self._search_step, pattern, start, start, False)
+
+    def _search_step(self, pattern, position, origin, wrapped):
+        self._search_job = None
+        text = self.text
+        limit = origin if wrapped else len(text)
+        end = min(limit, position + SEARCH_CHARS_PER_TICK)
+        # Overlap slices so matches spanning a slice boundary are found
+        match = pattern.search(text, position, min(len(text), end + len(pattern.pattern)))
+        if match and match.start() < limit:
+            self._show_match(match.start(), match.end())
+            return
+        if end < limit:
+            self._search_job = self.frame.after(TICK_MS, self._search_step,
+                                                pattern, end, origin, wrapped)
+        elif not wrapped and origin > 0:
+            self._search_job = self.frame.after(TICK_MS, self._search_step,
+                                                pattern, 0, origin, True)
+        else:
+            self._match = None
+            self.info_label.configure(text="No matches")
+            self._render()
+
+    def _show_match(self, start, end):
+        self._match = (start, end)
+        self._jump_to(start, self.visible_lines // 2)
+        # Bring the match into view horizontally as well
+        for row, (line_start, line) in enumerate(self._visible):
+            if line_start <= start <= line_start + len(line):
+                self.text_widget.see(f"{row + 1}.{start - line_start}")
+                break
@@ -0,0 +1,154 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+_shared_timer_service = None
+_shared_lock = threading.Lock()
+
+
+def get_timer_service():
+    """Return the process-wide TimerService, starting its thread on first use"""
+    global _shared_timer_service
+    with _shared_lock:
+        if _shared_timer_service is None:
+            _shared_timer_service = TimerService()
+            _shared_timer_service.start()
+        return _shared_timer_service
+
+
+class TimerHandle:
+    """A scheduled callback; cancel() it or pass it to TimerService.reschedule()"""
+
+    __slots__ = ('deadline', 'seq', 'callback', 'args', 'cancelled', '_service')
+
+    def __init__(self, service, deadline, seq, callback, args):
+        self._service = service
+        self.deadline = deadline
+        self.seq = seq
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+    def cancel(self):
+        self._service.cancel(self)
+
+
+class TimerService:
+    """One thread running every timer from a heap of deadlines.
+
+    Replaces a threading.Timer (an OS thread) per timeout. Scheduling is
+    O(log n); cancelling marks the handle and leaves it for the heap to
+    discard, compacting when cancelled entries dominate. Callbacks run on
+    the service thread and must be short. Pass a fake clock and call
+    run_pending() instead of start() to drive timers deterministically.
+    """
+
+    def __init__(self, clock=time.monotonic, name="timer-service"):
+        self.clock = clock
+        self.name = name
+        self._heap = []
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def schedule(self, delay, callback, *args):
+        """Run callback(*args) after delay seconds"""
+        with self._condition:
+            handle = TimerHandle(self, self.clock() + delay, next(self._seq), callback, args)
+            heapq.heappush(self._heap, handle)
+            if self._heap[0] is handle:
+                self._condition.notify()
+            return handle
+
+    def cancel(self, handle):
+        """Cancel a pending timer; cancelling twice or after it ran is harmless"""
+        if handle is None:
+            return
+        with self._condition:
+            if handle.cancelled:
+                return
+            handle.cancelled = True
+            self._cancelled += 1
+            if self._cancelled > 64 and self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if not entry.cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    def reschedule(self, handle, delay, callback, *args):
+        """Cancel handle (if any) and schedule callback again; returns the new handle"""
+        self.cancel(handle)
+        return self.schedule(delay, callback, *args)
+
+    def __len__(self):
+        with self._condition:
+            return len(self._heap) - self._cancelled
+
+    def _pop_due(self, now):
+        """Pop the next due, live timer or return None (lock held)"""
+        while self._heap:
+            head = self._heap[0]
+            if head.cancelled:
+                heapq.heappop(self._heap)
+                self._cancelled -= 1
+                continue
+            if head.deadline > now:
+                return None
+            heapq.heappop(self._heap)
+            # Mark as done so a later cancel() does not count it again
+            head.cancelled = True
+            return head
+        return None
+
+    def _run_callback(self, handle):
+        try:
+            handle.callback(*handle.args)
+        except Exception as e:
+            logging.error(f"Error in timer callback {getattr(handle.callback, '__name__', handle.callback)}: {e}")
+
+    def run_pending(self):
+        """Run every timer that is due according to the clock; returns how many ran"""
+        ran = 0
+        while True:
+            with self._condition:
+                handle = self._pop_due(self.clock())
+            if handle is None:
+                return ran
+            self._run_callback(handle)
+            ran += 1
+
+    def start(self):
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        logging.info("Timer service started")
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running:
+                    handle = self._pop_due(self.clock())
+                    if handle is not None:
+                        break
+                    timeout = self._heap[0].deadline - self.clock() if self._heap else None
+                    self._condition.wait(timeout)
+                else:
+                    return
+            self._run_callback(handle)
@@ -0,0 +1,104 @@
+import collections
+import logging
+import threading
+import time
+from metrics import STAGE_SECONDS
+
+# Event types posted by background threads
+EVENT_DECRYPT_DISPLAY = "decrypt_display"
+EVENT_NOTIFICATION = "notification"
+EVENT_SHOW_WINDOW = "show_window"
+EVENT_CALL = "call"
+
+# Drain quickly while events are flowing, back off while idle
+ACTIVE_INTERVAL_MS = 16
+IDLE_INTERVAL_MS = 100
+MAX_BATCH = 256
+
+
+class UIDispatcher:
+    """Single thread-safe entry point for UI work, drained on the Tk main loop.
+
+    Any thread may post(); only the thread running the Tk mainloop touches
+    widgets. Event types registered with coalesce=True only have their
+    latest event in each batch dispatched, so a burst of clipboard changes
+    renders once per frame instead of once per change.
+    """
+
+    def __init__(self, root, active_interval_ms=ACTIVE_INTERVAL_MS,
+                 idle_interval_ms=IDLE_INTERVAL_MS, max_batch=MAX_BATCH):
+        self.root = root
+        self.active_interval_ms = active_interval_ms
+        self.idle_interval_ms = idle_interval_ms
+        self.max_batch = max_batch
+        # deque.append/popleft are atomic, so posting never blocks on a lock
+        self._queue = collections.deque()
+        self._handlers = {EVENT_CALL: (self._call, False)}
+        self._after_id = None
+        self._ui_thread = threading.current_thread()
+        self.posted = 0
+        self.dispatched = 0
+        self.coalesced = 0
+
+    def register(self, event_type, handler, coalesce=False):
+        """Handle events of event_type on the UI thread with handler(*args)"""
+        self._handlers[event_type] = (handler, coalesce)
+
+    def post(self, event_type, *args):
+        """Queue an event from any thread"""
+        self._queue.append((event_type, args, time.perf_counter()))
+        self.posted += 1
+
+    def call(self, func, *args):
+        """Run func(*args) on the UI thread"""
+        self.post(EVENT_CALL, func, *args)
+
+    def in_ui_thread(self):
+        return threading.current_thread() is self._ui_thread
+
+    def start(self):
+        """Begin draining; must be called from the Tk thread"""
+        self._ui_thread = threading.current_thread()
+        if self._after_id is None:
+            self._after_id = self.root.after(self.active_interval_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _call(self, func, *args):
+        func(*args)
+
+    def _drain(self):
+        batch = []
+        while self._queue and len(batch) < self.max_batch:
+            batch.append(self._queue.popleft())
+
+        # Index of the last event of every coalescing type in this batch
+        latest = {}
+        for index, (event_type, _, _) in enumerate(batch):
+            handler = self._handlers.get(event_type)
+            if handler and handler[1]:
+                latest[event_type] = index
+
+        dispatch_latency = STAGE_SECONDS.labels("ui_dispatch")
+        for index, (event_type, args, posted_at) in enumerate(batch):
+            handler = self._handlers.get(event_type)
+            if handler is None:
+                logging.warning(f"No UI handler registered for {event_type}")
+                continue
+            func, coalesce = handler
+            if coalesce and latest[event_type] != index:
+                self.coalesced += 1
+                continue
+            try:
+                func(*args)
+                self.dispatched += 1
+                # Time from post() until the handler finished on the UI thread
+                dispatch_latency.observe(time.perf_counter() - posted_at)
+            except Exception as e:
+                logging.error(f"Error handling UI event {event_type}: {e}")
+
+        interval = self.active_interval_ms if batch or self._queue else self.idle_interval_ms
+        self._after_id = self.root.after(interval, self._drain)
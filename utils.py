@@ -1,22 +1,110 @@
 import os
 import base64
+import collections
+import hashlib
+import hmac
+import threading
+import time
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+DEFAULT_PBKDF2_ITERATIONS = 100000
+DEFAULT_SCRYPT_N = 2 ** 15
+DEFAULT_SCRYPT_R = 8
+DEFAULT_SCRYPT_P = 1
+KDFS = ("pbkdf2", "scrypt")
+
+# Derived keys kept in memory (never on disk), least recently used evicted first
+MAX_CACHED_KEYS = 8
+_derived_key_cache = collections.OrderedDict()
+_derived_key_cache_lock = threading.Lock()
+# Per-process secret so cache entries do not hold a plain hash of the passphrase
+_cache_secret = os.urandom(32)
+
 
 def generate_salt():
     """Generate a random salt for key derivation"""
     return os.urandom(16)
 
-def derive_key(password, salt):
+
+def derive_key(password, salt, iterations=DEFAULT_PBKDF2_ITERATIONS, kdf="pbkdf2",
+               scrypt_n=DEFAULT_SCRYPT_N, scrypt_r=DEFAULT_SCRYPT_R, scrypt_p=DEFAULT_SCRYPT_P):
     """Derive a key from password and salt"""
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-    )
+    if kdf == "pbkdf2":
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            iterations=iterations,
+        )
+    elif kdf == "scrypt":
+        kdf = Scrypt(salt=salt, length=32, n=scrypt_n, r=scrypt_r, p=scrypt_p)
+    else:
+        raise ValueError(f"Unknown key derivation function: {kdf}")
     return base64.urlsafe_b64encode(kdf.derive(password.encode()))
 
+
+def cached_derive_key(password, salt, **params):
+    """derive_key() with a bounded, memory-only cache keyed by salt and KDF settings.
+
+    The KDF cost is paid once per session for each salt instead of per use.
+    """
+    cache_key = (bytes(salt), tuple(sorted(params.items())))
+    fingerprint = hmac.new(_cache_secret, password.encode(), hashlib.sha256).digest()
+
+    with _derived_key_cache_lock:
+        cached = _derived_key_cache.get(cache_key)
+        if cached and hmac.compare_digest(cached[0], fingerprint):
+            _derived_key_cache.move_to_end(cache_key)
+            return cached[1]
+
+    key = derive_key(password, salt, **params)
+
+    with _derived_key_cache_lock:
+        _derived_key_cache[cache_key] = (fingerprint, key)
+        _derived_key_cache.move_to_end(cache_key)
+        while len(_derived_key_cache) > MAX_CACHED_KEYS:
+            _derived_key_cache.popitem(last=False)
+    return key
+
+
+def clear_derived_key_cache():
+    """Forget all cached derived keys"""
+    with _derived_key_cache_lock:
+        _derived_key_cache.clear()
+
+
+def calibrate_kdf(target_seconds=0.25, kdf="pbkdf2"):
+    """Pick KDF parameters that take about target_seconds on this machine.
+
+    Returns keyword arguments for derive_key(); teammates must all use the
+    same parameters, so calibrate once and share the result with the salt.
+    """
+    salt = generate_salt()
+    if kdf == "pbkdf2":
+        probe = 20000
+        start = time.perf_counter()
+        derive_key("calibration", salt, iterations=probe)
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        iterations = max(DEFAULT_PBKDF2_ITERATIONS, int(probe * target_seconds / elapsed))
+        return {"kdf": "pbkdf2", "iterations": iterations}
+
+    if kdf == "scrypt":
+        # scrypt cost doubles with n (as does memory: 128 * r * n bytes)
+        n = 2 ** 14
+        while n < 2 ** 20:
+            start = time.perf_counter()
+            derive_key("calibration", salt, kdf="scrypt", scrypt_n=n)
+            if time.perf_counter() - start >= target_seconds / 2:
+                break
+            n *= 2
+        return {"kdf": "scrypt", "scrypt_n": n, "scrypt_r": DEFAULT_SCRYPT_R,
+                "scrypt_p": DEFAULT_SCRYPT_P}
+
+    raise ValueError(f"Unknown key derivation function: {kdf}")
+
+
 def is_base64(text):
     """Check if text is base64 encoded"""
     try: